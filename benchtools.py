@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Timing and reporting helpers shared by the module benchmark CLIs."""
+
+import json
+import time
+from typing import Callable
+
+
+def best_time(fn: Callable[[], object], repeats: int = 3) -> float:
+    """Fastest of `repeats` runs of fn(), in seconds (the least noisy estimate on a busy machine)."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def print_report(report: dict):
+    print(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,1480 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Camera / facial-emotion pipeline for EmoCare.
+
+Also runs standalone for benchmarking (e.g. on the Jetson Nano).
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+
+# ---------- Model files & labels ----------
+YUNET_PATH = "models/face_detection_yunet_2023mar.onnx"
+EMOTION_MODEL_PATH = "models/emotion-ferplus-8.onnx"
+
+EMOTION_LABELS = [
+    "neutral",
+    "happiness",
+    "surprise",
+    "sadness",
+    "anger",
+    "disgust",
+    "fear",
+    "contempt",
+]
+
+EMOTION_INPUT_SIZE = 64
+
+
+# ---------- Process memory helpers ----------
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process (0 if it can't be determined)."""
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+    except Exception:
+        return 0
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (0 if it can't be determined)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            rss_pages = int(f.read().split()[1])
+        return rss_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux; peak rather than current, but better than nothing
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+    except Exception:
+        return 0
+
+
+# ---------- Model registry (load once per process) ----------
+class ModelRegistry:
+    """Lazily loads YuNet + FER+ once and hands the same instances to every caller.
+
+    OpenCV DNN objects are not safe to drive from two threads at once, so
+    callers that may run concurrently should hold `detector_lock` around
+    `detect()` and `emotion_lock` around `forward()`. The two models are
+    separate objects, so the render loop's face detection never waits on
+    an emotion forward pass running on the worker.
+    """
+
+    def __init__(self, yunet_path: str = YUNET_PATH, emotion_model_path: str = EMOTION_MODEL_PATH):
+        self.yunet_path = yunet_path
+        self.emotion_model_path = emotion_model_path
+        self.detector_lock = threading.Lock()
+        self.emotion_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._detector = None
+        self._detector_size = None
+        self._emotion_net = None
+        self._stats = {}
+
+    def missing_files(self) -> list:
+        # Once a model is in memory its file no longer matters
+        missing = []
+        if self._detector is None and not os.path.exists(self.yunet_path):
+            missing.append(self.yunet_path)
+        if self._emotion_net is None and not os.path.exists(self.emotion_model_path):
+            missing.append(self.emotion_model_path)
+        return missing
+
+    def detector(self):
+        if self._detector is None:
+            with self._load_lock:
+                if self._detector is None:
+                    self._detector = self._timed_load("yunet", self._load_detector, self._warm_detector)
+        return self._detector
+
+    def emotion_net(self):
+        if self._emotion_net is None:
+            with self._load_lock:
+                if self._emotion_net is None:
+                    self._emotion_net = self._timed_load("ferplus", self._load_emotion_net, self._warm_emotion_net)
+        return self._emotion_net
+
+    def detect_faces(self, frame) -> list:
+        """YuNet boxes [(x, y, w, h), ...] for a BGR frame.
+
+        setInputSize() is only called when the frame size actually changes.
+        """
+        detector = self.detector()
+        h, w = frame.shape[:2]
+        with self.detector_lock:
+            if self._detector_size != (w, h):
+                detector.setInputSize((w, h))
+                self._detector_size = (w, h)
+            _, faces = detector.detect(frame)
+        if faces is None:
+            return []
+        return [tuple(map(int, f[:4])) for f in faces]
+
+    def diagnostics(self) -> dict:
+        """Per-model load/warm-up timings plus current process RSS."""
+        return {
+            "models": {name: dict(info) for name, info in self._stats.items()},
+            "rss_mb": current_rss_bytes() / (1024 * 1024),
+        }
+
+    # ---- internals ----
+    def _timed_load(self, name, load_fn, warm_fn):
+        rss_before = current_rss_bytes()
+        t0 = time.perf_counter()
+        model = load_fn()
+        t1 = time.perf_counter()
+        warm_fn(model)
+        t2 = time.perf_counter()
+        self._stats[name] = {
+            "load_ms": (t1 - t0) * 1000.0,
+            "warmup_ms": (t2 - t1) * 1000.0,
+            "rss_delta_mb": (current_rss_bytes() - rss_before) / (1024 * 1024),
+            "loaded_at": time.time(),
+        }
+        return model
+
+    def _load_detector(self):
+        return cv2.FaceDetectorYN.create(
+            self.yunet_path, "",
+            (320, 320),
+            score_threshold=0.7,
+            nms_threshold=0.3,
+            top_k=5000,
+        )
+
+    def _load_emotion_net(self):
+        return cv2.dnn.readNetFromONNX(self.emotion_model_path)
+
+    @staticmethod
+    def _warm_detector(detector):
+        # First detect() allocates the network buffers; do it off the user's first frame
+        detector.setInputSize((320, 320))
+        detector.detect(np.zeros((320, 320, 3), dtype=np.uint8))
+        # (the registry's cached size starts as None, so the first real frame re-sizes)
+
+    @staticmethod
+    def _warm_emotion_net(net):
+        net.setInput(np.zeros((1, 1, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE), dtype=np.float32))
+        net.forward()
+
+
+def format_model_diagnostics(diag: dict) -> Optional[str]:
+    """Short markdown summary for the diagnostics panel (None if nothing is loaded yet)."""
+    if not diag.get("models"):
+        return None
+    lines = []
+    for name, info in diag["models"].items():
+        lines.append(
+            f"- **{name}**: load {info['load_ms']:.0f} ms · warm-up {info['warmup_ms']:.0f} ms · "
+            f"+{info['rss_delta_mb']:.1f} MB"
+        )
+    lines.append(f"- Process RSS: {diag['rss_mb']:.0f} MB")
+    return "\n".join(lines)
+
+
+# ---------- Background capture (latest-frame-only) ----------
+class FrameGrabber:
+    """Owns the VideoCapture on a dedicated thread and keeps only the newest frame.
+
+    Consumers call `wait_latest(last_seq)` and always get the most recent
+    frame; anything captured in between is dropped instead of queued.
+    Frames are shared between consumers, so copy before drawing on them.
+    """
+
+    def __init__(self, device: int = 0, width: int = 640, height: int = 480, backend: int = cv2.CAP_V4L2):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.backend = backend
+        self.error = None
+
+        self._cap = None
+        self._thread = None
+        self._running = False
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._frame_taken = True
+
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+        self._started_at = None
+
+    def start(self) -> bool:
+        cap = cv2.VideoCapture(self.device, self.backend)
+
+        # Reduce load for smoother preview
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+
+        # Ask webcam for MJPG (often faster)
+        try:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+        except Exception:
+            pass
+
+        # Reduce buffering lag (not supported on all builds, safe to try)
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except Exception:
+            pass
+
+        if not cap.isOpened():
+            cap.release()
+            self.error = "Could not open webcam."
+            return False
+
+        self._cap = cap
+        self._running = True
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="emocare-capture", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def wait_latest(self, last_seq: int = 0, timeout: float = 1.0):
+        """Block until a frame newer than `last_seq` exists; return (seq, frame) or None."""
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while self._running and self._seq <= last_seq:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self._seq <= last_seq:
+                return None
+            self._frame_taken = True
+            return self._seq, self._frame
+
+    def mark_processed(self):
+        self.processed += 1
+
+    def stats(self) -> dict:
+        elapsed = (time.perf_counter() - self._started_at) if self._started_at else 0.0
+        return {
+            "captured": self.captured,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "capture_fps": self.captured / elapsed if elapsed > 0 else 0.0,
+            "processed_fps": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _run(self):
+        while self._running:
+            ret, frame = self._cap.read()
+            if not ret or frame is None:
+                self.error = "Failed to read frame from webcam."
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+                break
+            with self._cond:
+                if not self._frame_taken:
+                    self.dropped += 1
+                self._frame = frame
+                self._seq += 1
+                self._frame_taken = False
+                self.captured += 1
+                self._cond.notify_all()
+
+
+def format_capture_stats(stats: dict) -> str:
+    return (
+        f"captured {stats['captured']} ({stats['capture_fps']:.1f} fps) · "
+        f"processed {stats['processed']} ({stats['processed_fps']:.1f} fps) · "
+        f"dropped {stats['dropped']}"
+    )
+
+
+# ---------- Downscaled detection ----------
+class ScaledDetector:
+    """Runs YuNet on a downscaled copy of the frame and maps boxes back to full resolution.
+
+    The small frame is resized into a buffer that is reused while the input
+    size stays the same. `det_width=None` (or >= frame width) detects at full size.
+    """
+
+    def __init__(self, registry: ModelRegistry, det_width: Optional[int] = 320):
+        self.registry = registry
+        self.det_width = det_width
+        self._buf = None
+
+    def __call__(self, frame) -> list:
+        h, w = frame.shape[:2]
+        if not self.det_width or self.det_width >= w:
+            return self.registry.detect_faces(frame)
+
+        scale = self.det_width / w
+        dw, dh = self.det_width, max(1, int(round(h * scale)))
+        if self._buf is None or self._buf.shape[:2] != (dh, dw):
+            self._buf = np.empty((dh, dw, 3), dtype=np.uint8)
+        cv2.resize(frame, (dw, dh), dst=self._buf, interpolation=cv2.INTER_AREA)
+
+        inv = 1.0 / scale
+        return [
+            (int(x * inv), int(y * inv), int(bw * inv), int(bh * inv))
+            for (x, y, bw, bh) in self.registry.detect_faces(self._buf)
+        ]
+
+
+def iter_frames(source: str, max_frames: Optional[int] = None):
+    """Yield BGR frames from a video file or a directory of images (sorted by name)."""
+    count = 0
+    if os.path.isdir(source):
+        exts = (".jpg", ".jpeg", ".png", ".bmp")
+        for name in sorted(os.listdir(source)):
+            if max_frames is not None and count >= max_frames:
+                return
+            if not name.lower().endswith(exts):
+                continue
+            frame = cv2.imread(os.path.join(source, name))
+            if frame is None:
+                continue
+            count += 1
+            yield frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {source}")
+    try:
+        while max_frames is None or count < max_frames:
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                break
+            count += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def sweep_detection_scales(
+    registry: ModelRegistry,
+    source: str,
+    widths=(640, 480, 400, 320, 240, 160),
+    max_frames: int = 300,
+    match_iou: float = 0.5,
+) -> list:
+    """Face recall and latency of each detection width vs full-resolution YuNet.
+
+    Full-resolution detections on each recorded frame are the reference;
+    recall is the share of reference faces matched (IoU >= `match_iou`)
+    by the downscaled run.
+    """
+    frames = list(iter_frames(source, max_frames))
+    if not frames:
+        raise ValueError(f"No frames read from {source}")
+
+    full = ScaledDetector(registry, det_width=None)
+    reference = [full(f) for f in frames]
+    total_ref = sum(len(r) for r in reference)
+
+    rows = []
+    for width in widths:
+        det = ScaledDetector(registry, det_width=width)
+        det(frames[0])  # size the buffer / detector outside the timed loop
+        latencies = []
+        found = 0
+        extra = 0
+        for frame, ref in zip(frames, reference):
+            t0 = time.perf_counter()
+            boxes = det(frame)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            unmatched = list(boxes)
+            for rb in ref:
+                if not unmatched:
+                    break
+                best = max(unmatched, key=lambda b: box_iou(rb, b))
+                if box_iou(rb, best) >= match_iou:
+                    found += 1
+                    unmatched.remove(best)
+            extra += len(unmatched)
+        rows.append({
+            "det_width": width,
+            "recall": found / total_ref if total_ref else None,
+            "extra_boxes": extra,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        })
+    return rows
+
+
+# ---------- Face tracking (YuNet every K frames, optical flow in between) ----------
+class FaceTracker:
+    """Runs the detector every `redetect_every` frames and carries boxes forward in between.
+
+    Boxes are propagated with pyramidal Lucas-Kanade flow on a handful of
+    corner points per face (median shift). If too few points survive the
+    forward-backward check, the tracker falls back to a full detection on
+    that frame instead of guessing.
+    """
+
+    def __init__(self, detect_fn, redetect_every: int = 5, min_quality: float = 0.5, points_per_face: int = 20):
+        self.detect_fn = detect_fn
+        self.redetect_every = max(1, redetect_every)
+        self.min_quality = min_quality
+        self.points_per_face = points_per_face
+
+        self._gray = None
+        self._prev_gray = None
+        self._boxes = []
+        self._points = []  # per box: float32 (n, 1, 2)
+        self._since_detect = 0
+
+        self.frames = 0
+        self.detections = 0
+        self._started_at = None
+
+    def update(self, frame) -> list:
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        self.frames += 1
+
+        h, w = frame.shape[:2]
+        if self._gray is None or self._gray.shape != (h, w):
+            self._gray = np.empty((h, w), dtype=np.uint8)
+            self._prev_gray = np.empty((h, w), dtype=np.uint8)
+            self._since_detect = self.redetect_every  # force a detection
+        self._prev_gray, self._gray = self._gray, self._prev_gray
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        tracked = None
+        if self._since_detect < self.redetect_every and self._boxes:
+            tracked = self._propagate(w, h)
+
+        if tracked is None:
+            self._boxes = self.detect_fn(frame)
+            self._points = [self._seed_points(box) for box in self._boxes]
+            self._since_detect = 1
+            self.detections += 1
+        else:
+            self._boxes = tracked
+            self._since_detect += 1
+        return list(self._boxes)
+
+    def duty_cycle(self) -> float:
+        return self.detections / self.frames if self.frames else 0.0
+
+    def stats(self) -> dict:
+        elapsed = (time.perf_counter() - self._started_at) if self._started_at else 0.0
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "duty_cycle": self.duty_cycle(),
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _seed_points(self, box):
+        h, w = self._gray.shape
+        x0, y0, x1, y1 = clamp_box(box, w, h)
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        pts = cv2.goodFeaturesToTrack(
+            self._gray[y0:y1, x0:x1],
+            maxCorners=self.points_per_face,
+            qualityLevel=0.01,
+            minDistance=4,
+        )
+        if pts is None or len(pts) < 4:
+            # Flat region (e.g. dim lighting): fall back to a coarse grid
+            xs = np.linspace(x0 + (x1 - x0) * 0.2, x0 + (x1 - x0) * 0.8, 4)
+            ys = np.linspace(y0 + (y1 - y0) * 0.2, y0 + (y1 - y0) * 0.8, 4)
+            return np.array([[[x, y]] for y in ys for x in xs], dtype=np.float32)
+        pts += np.array([x0, y0], dtype=np.float32)
+        return pts
+
+    def _propagate(self, w, h):
+        new_boxes = []
+        new_points = []
+        for box, pts in zip(self._boxes, self._points):
+            if pts is None or len(pts) == 0:
+                return None
+            nxt, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, self._gray, pts, None, winSize=(15, 15), maxLevel=2)
+            back, status_back, _ = cv2.calcOpticalFlowPyrLK(self._gray, self._prev_gray, nxt, None, winSize=(15, 15), maxLevel=2)
+            fb_err = np.linalg.norm((pts - back).reshape(-1, 2), axis=1)
+            good = (status.reshape(-1) == 1) & (status_back.reshape(-1) == 1) & (fb_err < 1.0)
+            if good.mean() < self.min_quality:
+                return None
+            shift = np.median((nxt - pts).reshape(-1, 2)[good], axis=0)
+            x, y, bw, bh = box
+            nx = int(round(x + shift[0]))
+            ny = int(round(y + shift[1]))
+            if nx + bw <= 0 or ny + bh <= 0 or nx >= w or ny >= h:
+                return None  # left the frame
+            new_boxes.append((nx, ny, bw, bh))
+            new_points.append(nxt[good].reshape(-1, 1, 2))
+        self._points = new_points
+        return new_boxes
+
+
+def format_tracker_stats(stats: dict) -> str:
+    return f"{stats['fps']:.1f} fps end-to-end · detector on {stats['duty_cycle'] * 100:.0f}% of frames"
+
+
+# ---------- Emotion inference (off the UI thread) ----------
+class FaceEmotion(NamedTuple):
+    box: tuple  # (x, y, w, h) in frame pixels at submit time
+    emotion: str
+    confidence: float
+    probs: Optional[np.ndarray] = None  # full 8-class distribution
+
+
+class EmotionResult(NamedTuple):
+    emotion: str  # largest face, kept for the single-label overlay
+    confidence: float
+    timestamp: float
+    faces: tuple = ()
+
+
+def box_iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def clamp_box(box, w, h):
+    """Clamp (x, y, bw, bh) to the frame and return slice bounds (x0, y0, x1, y1)."""
+    x, y, bw, bh = box
+    return max(0, x), max(0, y), min(w, x + bw), min(h, y + bh)
+
+
+# ---------- Opt-in debug capture of FER+ inputs ----------
+class DebugCapture:
+    """Sampled, rate-limited copies of what FER+ actually sees.
+
+    Keeps the last `ring_size` samples in memory for the UI and, if a
+    `directory` is given, writes them from a background thread so the
+    inference path never touches the filesystem.
+    """
+
+    def __init__(self, directory: Optional[str] = None, min_interval: float = 1.0, ring_size: int = 12):
+        self.directory = directory
+        self.min_interval = min_interval
+        self.ring = deque(maxlen=ring_size)
+        self._last = 0.0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self.written = 0
+        self.skipped_writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._queue = queue.Queue(maxsize=32)
+            self._thread = threading.Thread(target=self._write_loop, name="emocare-debug-writer", daemon=True)
+            self._thread.start()
+
+    def offer(self, face_bgr, small_gray) -> bool:
+        now = time.time()
+        with self._lock:
+            if now - self._last < self.min_interval:
+                return False
+            self._last = now
+        sample = {
+            "timestamp": now,
+            "full": cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY),
+            "input": small_gray.copy(),
+            "min": int(small_gray.min()),
+            "max": int(small_gray.max()),
+        }
+        self.ring.append(sample)
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(sample)
+            except queue.Full:
+                self.skipped_writes += 1
+        return True
+
+    def snapshots(self) -> list:
+        return list(self.ring)
+
+    def close(self):
+        if self._queue is not None:
+            try:
+                self._queue.put(None, timeout=1.0)
+            except queue.Full:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _write_loop(self):
+        while True:
+            sample = self._queue.get()
+            if sample is None:
+                break
+            stem = os.path.join(self.directory, f"face_{int(sample['timestamp'] * 1000)}")
+            try:
+                cv2.imwrite(stem + "_full.jpg", sample["full"])
+                cv2.imwrite(stem + "_input.png", sample["input"])
+                self.written += 1
+            except Exception:
+                pass
+
+
+class FacePreprocessor:
+    """FER+ input stage with reusable buffers (no per-frame image or blob buffers).
+
+    Each crop is resized straight into a 64x64 BGR buffer, converted to gray
+    in place and cast into a preallocated float32 NCHW blob. Resizing before
+    the gray conversion means the crop never needs its own gray copy. What
+    is still allocated per frame is the small view objects numpy creates
+    for slices (about 1.4 KB under tracemalloc), independent of crop size.
+    """
+
+    def __init__(self, max_faces: int = 8, size: int = EMOTION_INPUT_SIZE):
+        self.size = size
+        self._bgr = np.empty((size, size, 3), dtype=np.uint8)
+        self._gray = np.empty((size, size), dtype=np.uint8)
+        self._blob = np.empty((max_faces, 1, size, size), dtype=np.float32)
+        self._scores = np.empty((max_faces, len(EMOTION_LABELS)), dtype=np.float32)
+        self._row_max = np.empty((max_faces, 1), dtype=np.float32)
+        self._row_sum = np.empty((max_faces, 1), dtype=np.float32)
+
+    @property
+    def max_faces(self) -> int:
+        return self._blob.shape[0]
+
+    def blob(self, faces_bgr, debug: Optional[DebugCapture] = None):
+        """Fill and return a view of the shared blob for these crops (valid until the next call)."""
+        n = min(len(faces_bgr), self.max_faces)
+        for i in range(n):
+            face = faces_bgr[i]
+            cv2.resize(face, (self.size, self.size), dst=self._bgr, interpolation=cv2.INTER_LINEAR)
+            cv2.cvtColor(self._bgr, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            np.copyto(self._blob[i, 0], self._gray, casting="unsafe")
+            if debug is not None:
+                debug.offer(face, self._gray)
+        return self._blob[:n]
+
+    def scores_buffer(self, n: int):
+        return self._scores[:n]
+
+    def softmax_(self, scores):
+        """Row-wise softmax computed in place on `scores` (shape (n, classes))."""
+        n = scores.shape[0]
+        row_max = self._row_max[:n]
+        row_sum = self._row_sum[:n]
+        np.max(scores, axis=1, keepdims=True, out=row_max)
+        np.subtract(scores, row_max, out=scores)
+        np.exp(scores, out=scores)
+        np.sum(scores, axis=1, keepdims=True, out=row_sum)
+        np.divide(scores, row_sum, out=scores)
+        return scores
+
+
+def _forward(emotion_net, blob, lock=None):
+    if lock is not None:
+        with lock:
+            emotion_net.setInput(blob)
+            return emotion_net.forward()
+    emotion_net.setInput(blob)
+    return emotion_net.forward()
+
+
+def classify_faces(
+    emotion_net,
+    faces_bgr,
+    lock=None,
+    batched: bool = True,
+    debug: Optional[DebugCapture] = None,
+    preprocessor: Optional[FacePreprocessor] = None,
+    with_probs: bool = False,
+) -> list:
+    """Run FER+ on BGR face crops (views are fine) and return [(label, confidence), ...].
+
+    With `batched=True` all crops go through a single NCHW forward() call.
+    Pass a long-lived `preprocessor` to reuse its buffers across frames.
+    `with_probs=True` appends a copy of each face's probability vector.
+    """
+    if not faces_bgr:
+        return []
+    pre = preprocessor or FacePreprocessor(max_faces=len(faces_bgr))
+    blob = pre.blob(faces_bgr, debug)
+    n = blob.shape[0]
+
+    if batched and n > 1:
+        scores = _forward(emotion_net, blob, lock).reshape(n, -1)
+        if scores.shape[1] != len(EMOTION_LABELS):
+            raise ValueError(f"Unexpected batched output shape {scores.shape}")
+    else:
+        scores = pre.scores_buffer(n)
+        for i in range(n):
+            scores[i] = _forward(emotion_net, blob[i:i + 1], lock).reshape(-1)
+
+    probs = pre.softmax_(scores)
+    idx = probs.argmax(axis=1)
+    if with_probs:
+        return [(EMOTION_LABELS[int(i)], float(probs[row, i]), probs[row].copy()) for row, i in enumerate(idx)]
+    return [(EMOTION_LABELS[int(i)], float(probs[row, i])) for row, i in enumerate(idx)]
+
+
+def _legacy_preprocess(face_bgr, scores):
+    # Per-face path the emotion worker used before FacePreprocessor: a fresh gray image,
+    # resized copy and float32 blob for every crop, then a numpy softmax
+    gray = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE))
+    blob = gray.astype("float32").reshape(1, 1, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE)
+    exp = np.exp(scores - np.max(scores))
+    probs = exp / exp.sum()
+    return blob, probs
+
+
+def measure_preprocess_allocations(iterations: int = 200, face_size: int = 120) -> dict:
+    """tracemalloc bytes allocated per frame: original crop path vs FacePreprocessor.
+
+    Runs preprocessing + softmax only (no network), so it works without the model files.
+    """
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    face = frame[100:100 + face_size, 200:200 + face_size]
+    fake_scores = rng.standard_normal((1, len(EMOTION_LABELS))).astype(np.float32)
+    pre = FacePreprocessor(max_faces=1)
+    scores = np.empty_like(fake_scores)
+    faces = (face,)
+
+    def buffered():
+        pre.blob(faces)
+        np.copyto(scores, fake_scores)
+        pre.softmax_(scores)
+
+    def legacy():
+        _legacy_preprocess(face, fake_scores.reshape(-1))
+
+    report = {}
+    for name, fn in (("legacy", legacy), ("buffered", buffered)):
+        fn()  # warm caches outside the measured window
+        tracemalloc.start()
+        per_frame = []
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            per_frame.append(peak - current)
+        tracemalloc.stop()
+        per_frame.sort()
+        report[name] = {
+            "median_bytes_per_frame": per_frame[len(per_frame) // 2],
+            "max_bytes_per_frame": per_frame[-1],
+        }
+    return report
+
+
+def match_face_label(box, faces, min_iou: float = 0.3) -> Optional[FaceEmotion]:
+    """Find the labelled face that best overlaps `box` (faces move between submit and draw)."""
+    if not faces:
+        return None
+    best = max(faces, key=lambda f: box_iou(box, f.box))
+    return best if box_iou(box, best.box) >= min_iou else None
+
+
+def annotate_faces(frame, boxes, faces):
+    """Draw every face box with its own emotion label (if one has been classified)."""
+    for box in boxes:
+        x, y, bw, bh = box
+        cv2.rectangle(frame, (x, y), (x + bw, y + bh), (0, 255, 0), 2)
+        face = match_face_label(box, faces)
+        if face is not None:
+            cv2.putText(
+                frame, f"{face.emotion} {face.confidence:.2f}",
+                (x, max(15, y - 8)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                (0, 255, 255),
+                1,
+            )
+
+
+def draw_primary_label(frame, emotion: Optional[str], confidence: float):
+    """Top-left overlay with the main (largest face) emotion."""
+    if not emotion:
+        return
+    cv2.putText(
+        frame, f"{emotion} ({confidence:.2f})",
+        (10, 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.8,
+        (0, 255, 255),
+        2,
+    )
+
+
+# ---------- Preview delivery (JPEG bytes at a capped display rate) ----------
+class PreviewEncoder:
+    """Turns annotated frames into JPEG bytes for the browser, at most `max_fps` times a second.
+
+    Sending encoded bytes means Streamlit forwards them as-is instead of
+    converting a raw array to PNG on every frame. The annotation canvas is
+    a reused buffer, and frames are only copied/drawn/encoded when a
+    display slot is due, independently of the capture and inference rates.
+    """
+
+    def __init__(self, quality: int = 75, max_fps: float = 12.0):
+        self.quality = int(quality)
+        self.max_fps = max_fps
+        self._params = [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+        self._canvas = None
+        self._last = 0.0
+
+        self.frames = 0
+        self.bytes_total = 0
+        self.encode_ms_total = 0.0
+
+    def due(self, now: Optional[float] = None) -> bool:
+        now = time.perf_counter() if now is None else now
+        if self.max_fps and (now - self._last) < 1.0 / self.max_fps:
+            return False
+        self._last = now
+        return True
+
+    def canvas(self, frame):
+        """Copy `frame` into the reusable drawing buffer and return it."""
+        if self._canvas is None or self._canvas.shape != frame.shape:
+            self._canvas = np.empty_like(frame)
+        np.copyto(self._canvas, frame)
+        return self._canvas
+
+    def encode(self, frame) -> bytes:
+        t0 = time.perf_counter()
+        ok, buf = cv2.imencode(".jpg", frame, self._params)
+        if not ok:
+            return b""
+        data = buf.tobytes()
+        self.encode_ms_total += (time.perf_counter() - t0) * 1000.0
+        self.frames += 1
+        self.bytes_total += len(data)
+        return data
+
+    def stats(self) -> dict:
+        n = self.frames or 1
+        return {
+            "displayed": self.frames,
+            "avg_kb": self.bytes_total / n / 1024.0,
+            "avg_encode_ms": self.encode_ms_total / n,
+        }
+
+
+def format_preview_stats(stats: dict) -> str:
+    return (
+        f"displayed {stats['displayed']} frames · {stats['avg_kb']:.0f} KB each · "
+        f"encode {stats['avg_encode_ms']:.1f} ms"
+    )
+
+
+# ---------- Temporal smoothing (stable labels per face) ----------
+class _FaceTrack:
+    __slots__ = ("box", "ema", "last_ts", "stable", "candidate", "candidate_since")
+
+    def __init__(self, box, probs, ts):
+        self.box = box
+        self.ema = probs.astype(np.float32, copy=True)
+        self.last_ts = ts
+        self.stable = None
+        self.candidate = None
+        self.candidate_since = ts
+
+
+class EmotionSmoother:
+    """EMA of the FER+ distribution per tracked face, with switch hysteresis.
+
+    - `half_life`: seconds for an old observation to lose half its weight
+      (time-based, so it behaves the same at any inference rate).
+    - A face only gets a stable label once the top class's smoothed
+      probability is >= `min_confidence` and has stayed on top for `hold`
+      seconds; switching away from a stable label additionally needs the
+      challenger to lead it by `switch_margin`.
+    """
+
+    def __init__(
+        self,
+        half_life: float = 0.8,
+        hold: float = 0.6,
+        switch_margin: float = 0.1,
+        min_confidence: float = 0.4,
+        max_age: float = 2.0,
+        match_iou: float = 0.3,
+    ):
+        self.half_life = half_life
+        self.hold = hold
+        self.switch_margin = switch_margin
+        self.min_confidence = min_confidence
+        self.max_age = max_age
+        self.match_iou = match_iou
+        self._tracks = []
+        self._last_result_ts = None
+
+    def update(self, result: Optional[EmotionResult]):
+        """Fold in a worker result; repeated calls with the same result are ignored."""
+        if result is None or result.timestamp == self._last_result_ts:
+            return
+        self._last_result_ts = ts = result.timestamp
+
+        unmatched = list(self._tracks)
+        for face in result.faces:
+            if face.probs is None:
+                continue
+            track = None
+            if unmatched:
+                cand = max(unmatched, key=lambda t: box_iou(face.box, t.box))
+                if box_iou(face.box, cand.box) >= self.match_iou:
+                    track = cand
+                    unmatched.remove(cand)
+            if track is None:
+                self._tracks.append(_FaceTrack(face.box, face.probs, ts))
+                track = self._tracks[-1]
+                self._update_stable(track, ts)
+                continue
+
+            dt = max(0.0, ts - track.last_ts)
+            keep = 0.5 ** (dt / self.half_life) if self.half_life > 0 else 0.0
+            track.ema *= keep
+            track.ema += (1.0 - keep) * face.probs
+            track.box = face.box
+            track.last_ts = ts
+            self._update_stable(track, ts)
+
+        self._tracks = [t for t in self._tracks if ts - t.last_ts <= self.max_age]
+
+    def faces(self) -> tuple:
+        """Stable per-face labels (faces without one yet are omitted)."""
+        return tuple(
+            FaceEmotion(t.box, t.stable, float(t.ema[EMOTION_LABELS.index(t.stable)]), t.ema)
+            for t in self._tracks
+            if t.stable is not None
+        )
+
+    def primary(self) -> Optional[FaceEmotion]:
+        """Stable label of the largest tracked face."""
+        faces = self.faces()
+        if not faces:
+            return None
+        return max(faces, key=lambda f: f.box[2] * f.box[3])
+
+    def _update_stable(self, track: _FaceTrack, ts: float):
+        top = int(track.ema.argmax())
+        top_label = EMOTION_LABELS[top]
+        top_p = float(track.ema[top])
+
+        if top_label == track.stable:
+            track.candidate = None
+            return
+        if top_p < self.min_confidence:
+            track.candidate = None
+            return
+        if track.stable is not None:
+            current_p = float(track.ema[EMOTION_LABELS.index(track.stable)])
+            if top_p - current_p < self.switch_margin:
+                track.candidate = None
+                return
+        if track.candidate != top_label:
+            track.candidate = top_label
+            track.candidate_since = ts
+        if ts - track.candidate_since >= self.hold:
+            track.stable = top_label
+            track.candidate = None
+
+
+# FER+ class -> closest option in the sidebar mood picker (None = no suggestion)
+EMOTION_TO_MOOD = {
+    "neutral": "Neutral",
+    "happiness": "Happy / Excited",
+    "surprise": None,
+    "sadness": "Sad / Low",
+    "anger": "Angry / Frustrated",
+    "disgust": "Angry / Frustrated",
+    "fear": "Stressed / Overwhelmed",
+    "contempt": "Angry / Frustrated",
+}
+
+
+def benchmark_batching(emotion_net, max_faces: int = 8, repeats: int = 20, lock=None) -> list:
+    """Median latency of one batched forward vs N single forwards, for 1..max_faces faces."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    crops = [frame[(i // 4) * 120:(i // 4) * 120 + 96, (i % 4) * 150:(i % 4) * 150 + 96] for i in range(max_faces)]
+    pre = FacePreprocessor(max_faces=max_faces)
+    rows = []
+    for n in range(1, max_faces + 1):
+        timings = {}
+        for mode, batched in (("per_face_ms", False), ("batched_ms", True)):
+            samples = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                try:
+                    classify_faces(emotion_net, crops[:n], lock=lock, batched=batched, preprocessor=pre)
+                except Exception:
+                    samples = []
+                    break
+                samples.append((time.perf_counter() - t0) * 1000.0)
+            timings[mode] = float(np.median(samples)) if samples else None
+        speedup = None
+        if timings["per_face_ms"] and timings["batched_ms"]:
+            speedup = timings["per_face_ms"] / timings["batched_ms"]
+        rows.append({"faces": n, **timings, "speedup": speedup})
+    return rows
+
+
+class EmotionWorker:
+    """Classifies face crops on a background thread and publishes the newest result.
+
+    Instead of a fixed "every Nth frame" rule, `should_submit()` spaces
+    requests by the measured inference latency so FER+ never takes more than
+    `max_share` of the time, and never runs more often than `target_fps`.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        target_fps: float = 15.0,
+        max_share: float = 0.5,
+        queue_size: int = 1,
+        debug: Optional[DebugCapture] = None,
+        max_faces: int = 8,
+    ):
+        self.registry = registry
+        self.debug = debug
+        self.preprocessor = FacePreprocessor(max_faces=max_faces)
+        self.target_fps = target_fps
+        self.max_share = max_share
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._running = False
+        self._result_lock = threading.Lock()
+        self._latest = None
+
+        self._latency_ema = None
+        self._last_submit = 0.0
+        self.batching = True
+
+        self.submitted = 0
+        self.completed = 0
+        self.replaced = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="emocare-emotion", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def submit_interval(self) -> float:
+        frame_budget = 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+        if self._latency_ema is None:
+            return frame_budget
+        return max(frame_budget, self._latency_ema / self.max_share)
+
+    def should_submit(self, now: Optional[float] = None) -> bool:
+        now = time.perf_counter() if now is None else now
+        return (now - self._last_submit) >= self.submit_interval()
+
+    def submit(self, frame, boxes) -> bool:
+        """Queue a frame and its face boxes; the oldest pending frame is dropped if full.
+
+        The frame must not be modified afterwards (pass the grabber's frame,
+        not the one being annotated) so crops can be taken without copying.
+        """
+        if frame is None or not boxes:
+            return False
+        item = (frame, list(boxes)[:self.preprocessor.max_faces], time.time())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            try:
+                self._queue.get_nowait()
+                self.replaced += 1
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                return False
+        self._last_submit = time.perf_counter()
+        self.submitted += 1
+        return True
+
+    def latest(self) -> Optional[EmotionResult]:
+        with self._result_lock:
+            return self._latest
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "replaced": self.replaced,
+            "latency_ms": (self._latency_ema or 0.0) * 1000.0,
+            "interval_ms": self.submit_interval() * 1000.0,
+            "batched": self.batching,
+        }
+
+    def _run(self):
+        net = self.registry.emotion_net()
+        while self._running:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, boxes, ts = item
+            h, w = frame.shape[:2]
+            faces = []
+            for box in boxes:
+                x0, y0, x1, y1 = clamp_box(box, w, h)
+                if x1 > x0 and y1 > y0:
+                    faces.append((box, frame[y0:y1, x0:x1]))
+            if not faces:
+                continue
+            crops = [crop for _, crop in faces]
+            t0 = time.perf_counter()
+            try:
+                try:
+                    labels = classify_faces(
+                        net, crops, lock=self.registry.emotion_lock, batched=self.batching,
+                        debug=self.debug, preprocessor=self.preprocessor, with_probs=True,
+                    )
+                except Exception:
+                    if not (self.batching and len(crops) > 1):
+                        raise
+                    # Some OpenCV/ONNX builds pin the batch dim to 1; fall back for good
+                    self.batching = False
+                    labels = classify_faces(
+                        net, crops, lock=self.registry.emotion_lock, batched=False,
+                        debug=self.debug, preprocessor=self.preprocessor, with_probs=True,
+                    )
+            except Exception:
+                continue
+            dt = time.perf_counter() - t0
+            self._latency_ema = dt if self._latency_ema is None else (0.8 * self._latency_ema + 0.2 * dt)
+
+            per_face = tuple(
+                FaceEmotion(box, label, conf, probs) for (box, _), (label, conf, probs) in zip(faces, labels)
+            )
+            main = max(per_face, key=lambda f: f.box[2] * f.box[3])
+            with self._result_lock:
+                self._latest = EmotionResult(main.emotion, main.confidence, ts, per_face)
+            self.completed += 1
+
+
+# ---------- Engine: detect -> crop -> classify -> annotate ----------
+class EngineFrame(NamedTuple):
+    boxes: list
+    faces: tuple  # stable per-face labels
+    primary: Optional[FaceEmotion]
+    jpeg: Optional[bytes]  # None when no preview slot was due
+
+
+class CameraEngine:
+    """The whole per-frame camera pipeline, independent of where frames come from.
+
+    The Streamlit loop feeds it webcam frames; `bench` feeds it recorded
+    video. With `async_inference=True` FER+ runs on an EmotionWorker as in
+    the app; with False it runs inline on every frame that has faces, which
+    makes replay runs deterministic and lets the classify stage be timed.
+    """
+
+    STAGES = ("detect", "classify", "smooth", "annotate", "encode")
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        det_width: Optional[int] = 320,
+        redetect_every: int = 5,
+        async_inference: bool = True,
+        target_fps: float = 15.0,
+        preview_quality: int = 75,
+        preview_fps: float = 12.0,
+        debug: Optional[DebugCapture] = None,
+        record_timings: bool = False,
+    ):
+        self.registry = registry
+        self.detector = ScaledDetector(registry, det_width=det_width)
+        self.tracker = FaceTracker(self.detector, redetect_every=redetect_every)
+        self.smoother = EmotionSmoother()
+        self.preview = PreviewEncoder(quality=preview_quality, max_fps=preview_fps)
+        self.debug = debug
+        self.worker = EmotionWorker(registry, target_fps=target_fps, debug=debug) if async_inference else None
+        self._preprocessor = FacePreprocessor()
+        self.last_primary = None
+        self.timings = {name: [] for name in self.STAGES} if record_timings else None
+
+    def start(self):
+        if self.worker is not None:
+            self.worker.start()
+
+    def stop(self):
+        if self.worker is not None:
+            self.worker.stop()
+
+    def process(self, frame, timestamp: Optional[float] = None, render: bool = True) -> EngineFrame:
+        """Run one frame through the pipeline. `frame` is never modified."""
+        ts = time.time() if timestamp is None else timestamp
+
+        t0 = time.perf_counter()
+        boxes = self.tracker.update(frame)
+        self._record("detect", t0)
+
+        t0 = time.perf_counter()
+        if self.worker is not None:
+            if boxes and self.worker.should_submit():
+                self.worker.submit(frame, boxes)
+            result = self.worker.latest()
+        else:
+            result = self._classify_inline(frame, boxes, ts)
+            self._record("classify", t0)
+
+        t0 = time.perf_counter()
+        self.smoother.update(result)
+        faces = self.smoother.faces()
+        primary = self.smoother.primary()
+        if primary is not None:
+            self.last_primary = primary
+        self._record("smooth", t0)
+
+        jpeg = None
+        if render and self.preview.due():
+            t0 = time.perf_counter()
+            canvas = self.preview.canvas(frame)
+            annotate_faces(canvas, boxes, faces)
+            if self.last_primary is not None:
+                draw_primary_label(canvas, self.last_primary.emotion, self.last_primary.confidence)
+            self._record("annotate", t0)
+
+            t0 = time.perf_counter()
+            jpeg = self.preview.encode(canvas)
+            self._record("encode", t0)
+
+        return EngineFrame(boxes, faces, self.last_primary, jpeg)
+
+    def stats(self) -> dict:
+        out = {"tracker": self.tracker.stats(), "preview": self.preview.stats()}
+        if self.worker is not None:
+            out["emotion"] = self.worker.stats()
+        return out
+
+    def _classify_inline(self, frame, boxes, ts) -> Optional[EmotionResult]:
+        if not boxes:
+            return None
+        h, w = frame.shape[:2]
+        faces = []
+        for box in boxes[:self._preprocessor.max_faces]:
+            x0, y0, x1, y1 = clamp_box(box, w, h)
+            if x1 > x0 and y1 > y0:
+                faces.append((box, frame[y0:y1, x0:x1]))
+        if not faces:
+            return None
+        labels = classify_faces(
+            self.registry.emotion_net(), [crop for _, crop in faces],
+            lock=self.registry.emotion_lock, debug=self.debug,
+            preprocessor=self._preprocessor, with_probs=True,
+        )
+        per_face = tuple(
+            FaceEmotion(box, label, conf, probs) for (box, _), (label, conf, probs) in zip(faces, labels)
+        )
+        main = max(per_face, key=lambda f: f.box[2] * f.box[3])
+        return EmotionResult(main.emotion, main.confidence, ts, per_face)
+
+    def _record(self, stage, t0):
+        if self.timings is not None:
+            self.timings[stage].append((time.perf_counter() - t0) * 1000.0)
+
+
+def format_engine_stats(stats: dict) -> str:
+    parts = [format_tracker_stats(stats["tracker"])]
+    if "emotion" in stats:
+        parts.append(f"emotion {stats['emotion']['latency_ms']:.0f} ms, every {stats['emotion']['interval_ms']:.0f} ms")
+    parts.append(format_preview_stats(stats["preview"]))
+    return " · ".join(parts)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        import subprocess
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(
+    source: str,
+    max_frames: Optional[int] = None,
+    det_width: Optional[int] = 320,
+    redetect_every: int = 5,
+    render: bool = True,
+    preview_quality: int = 75,
+    trace_allocations: bool = False,
+    registry: Optional[ModelRegistry] = None,
+    replay_fps: float = 30.0,
+) -> dict:
+    """Replay recorded frames through CameraEngine and summarise latency, FPS, RSS and allocations.
+
+    Inference runs inline so every stage is timed. Frame timestamps are
+    synthesised at `replay_fps` so smoothing behaves as it would live.
+    """
+    registry = registry or ModelRegistry()
+    registry.detector()
+    registry.emotion_net()
+
+    engine = CameraEngine(
+        registry,
+        det_width=det_width,
+        redetect_every=redetect_every,
+        async_inference=False,
+        preview_quality=preview_quality,
+        preview_fps=0,  # encode every frame
+        record_timings=True,
+    )
+
+    if trace_allocations:
+        import tracemalloc
+        tracemalloc.start()
+    alloc_per_frame = []
+    frame_ms = []
+
+    n = 0
+    wall0 = time.perf_counter()
+    for frame in iter_frames(source, max_frames):
+        if trace_allocations:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        engine.process(frame, timestamp=n / replay_fps, render=render)
+        frame_ms.append((time.perf_counter() - t0) * 1000.0)
+        if trace_allocations:
+            _, peak = tracemalloc.get_traced_memory()
+            alloc_per_frame.append(peak - current)
+        n += 1
+    wall = time.perf_counter() - wall0
+    if trace_allocations:
+        tracemalloc.stop()
+
+    if n == 0:
+        raise ValueError(f"No frames read from {source}")
+
+    def summary(values):
+        if not values:
+            return None
+        arr = np.asarray(values, dtype=np.float64)
+        return {
+            "count": int(arr.size),
+            "mean": float(arr.mean()),
+            "p50": float(np.percentile(arr, 50)),
+            "p90": float(np.percentile(arr, 90)),
+            "p99": float(np.percentile(arr, 99)),
+            "max": float(arr.max()),
+        }
+
+    report = {
+        "source": source,
+        "revision": _git_revision(),
+        "config": {
+            "det_width": det_width,
+            "redetect_every": redetect_every,
+            "render": render,
+            "preview_quality": preview_quality,
+        },
+        "frames": n,
+        "wall_s": wall,
+        "fps": n / wall if wall > 0 else None,
+        "frame_ms": summary(frame_ms),
+        "stages_ms": {name: summary(values) for name, values in engine.timings.items()},
+        "detector_duty_cycle": engine.tracker.duty_cycle(),
+        "peak_rss_mb": peak_rss_bytes() / (1024 * 1024),
+    }
+    if trace_allocations:
+        report["alloc_bytes_per_frame"] = summary(alloc_per_frame)
+    return report
+
+
+# ---------- CLI ----------
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="EmoCare camera pipeline tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sweep = sub.add_parser("sweep-scales", help="Detection width vs face recall/latency on recorded video")
+    sweep.add_argument("source", help="Video file or directory of frames")
+    sweep.add_argument("--widths", default="640,480,400,320,240,160")
+    sweep.add_argument("--max-frames", type=int, default=300)
+
+    bench = sub.add_parser("bench", help="Replay recorded video through the pipeline and report JSON metrics")
+    bench.add_argument("source", help="Video file or directory of frames")
+    bench.add_argument("--max-frames", type=int, default=None)
+    bench.add_argument("--det-width", type=int, default=320, help="0 = full resolution")
+    bench.add_argument("--redetect-every", type=int, default=5)
+    bench.add_argument("--quality", type=int, default=75, help="Preview JPEG quality")
+    bench.add_argument("--no-render", action="store_true", help="Skip annotate + JPEG encode")
+    bench.add_argument("--trace-alloc", action="store_true", help="Measure per-frame allocations (slower)")
+    bench.add_argument("-o", "--output", help="Also write the JSON report to this file")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        report = run_benchmark(
+            args.source,
+            max_frames=args.max_frames,
+            det_width=args.det_width or None,
+            redetect_every=args.redetect_every,
+            render=not args.no_render,
+            preview_quality=args.quality,
+            trace_allocations=args.trace_alloc,
+        )
+        text = json.dumps(report, indent=2)
+        print(text)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+
+    elif args.command == "sweep-scales":
+        registry = ModelRegistry()
+        widths = [int(w) for w in args.widths.split(",") if w.strip()]
+        rows = sweep_detection_scales(registry, args.source, widths=widths, max_frames=args.max_frames)
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Conversation context for the LLM: recent turns verbatim, older ones summarized.
+
+The prompt is bounded by a token budget however long the session gets.
+Turns that slide out of the verbatim window are folded into a rolling
+summary a few at a time, so the summary is never rebuilt from the whole
+history.
+"""
+
+from typing import Callable, Optional
+
+from journal import estimate_tokens
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a short running summary of a supportive wellness conversation. "
+    "Merge the new messages into the existing summary. Keep the user's feelings, "
+    "situation, goals and anything they asked to remember; drop pleasantries. "
+    "Write at most {words} words in third person (\"The user...\"). Reply with the summary only."
+)
+
+
+def _message_tokens(text: str) -> int:
+    # +4 for the role/formatting overhead chat APIs add per message
+    return estimate_tokens(text) + 4
+
+
+def extractive_summary(previous: str, messages: list, max_chars: int = 1000) -> str:
+    """No-LLM fallback: keep the first sentence of each user message."""
+    notes = [previous] if previous else []
+    for msg in messages:
+        if msg["role"] != "user":
+            continue
+        text = " ".join(msg["text"].split())
+        cut = min((i for i in (text.find(". "), text.find("? "), text.find("! ")) if i >= 0), default=-1)
+        notes.append("The user said: " + (text[:cut + 1] if cut >= 0 else text[:200]))
+    summary = " ".join(notes)
+    return summary[-max_chars:]
+
+
+class ContextWindow:
+    """Builds chat messages from the history under a token budget.
+
+    `keep_turns` user/assistant pairs stay verbatim (fewer if they don't fit
+    the budget); everything older lives in `summary`. Call `compact()` after
+    each reply to fold newly evicted messages into the summary.
+    """
+
+    def __init__(self, budget_tokens: int = 1500, keep_turns: int = 3, summary_words: int = 120, max_fold: int = 40):
+        self.budget_tokens = budget_tokens
+        self.keep_turns = keep_turns
+        self.summary_words = summary_words
+        self.max_fold = max_fold
+        self.summary = ""
+        self.summarized = 0  # history messages already folded into the summary
+        self.last_stats = None
+
+    def reset(self):
+        self.summary = ""
+        self.summarized = 0
+        self.last_stats = None
+
+    def build(self, system_prompt: str, history: list, user_text: str):
+        """Return (messages, stats) for one request; `history` excludes the current message."""
+        if self.summarized > len(history):
+            self.reset()  # history was cleared or replaced
+        fixed = _message_tokens(system_prompt) + _message_tokens(user_text)
+        summary_block = f"Summary of the earlier conversation:\n{self.summary}" if self.summary else ""
+        if summary_block:
+            fixed += _message_tokens(summary_block)
+
+        recent = []
+        used = fixed
+        start = max(self.summarized, len(history) - 2 * self.keep_turns)
+        for msg in reversed(history[start:]):
+            cost = _message_tokens(msg["text"])
+            if used + cost > self.budget_tokens:
+                break
+            recent.append({"role": msg["role"], "content": msg["text"]})
+            used += cost
+        recent.reverse()
+
+        system = system_prompt + ("\n\n" + summary_block if summary_block else "")
+        messages = [{"role": "system", "content": system}] + recent + [{"role": "user", "content": user_text}]
+        self.last_stats = {
+            "prompt_tokens": used,
+            "verbatim_messages": len(recent),
+            "summarized_messages": self.summarized,
+            "history_messages": len(history),
+        }
+        return messages, self.last_stats
+
+    def compact(self, history: list, summarize: Optional[Callable[[str, str], str]] = None) -> bool:
+        """Fold messages older than the verbatim window into the summary.
+
+        `summarize(system_prompt, user_text)` is an LLM call; without one (or
+        if it fails) a short extractive summary is used. Returns True if the
+        summary changed.
+        """
+        if self.summarized > len(history):
+            self.reset()
+        cutoff = len(history) - 2 * self.keep_turns
+        if cutoff <= self.summarized:
+            return False
+        # after a restart with persisted history, don't fold hundreds of turns in one call
+        evicted = history[max(self.summarized, cutoff - self.max_fold):cutoff]
+        summary = None
+        if summarize is not None:
+            transcript = "\n".join(f"{m['role'].capitalize()}: {m['text']}" for m in evicted)
+            prompt = f"Existing summary:\n{self.summary or '(none)'}\n\nNew messages:\n{transcript}"
+            try:
+                summary = (summarize(SUMMARY_SYSTEM_PROMPT.format(words=self.summary_words), prompt) or "").strip()
+            except Exception:
+                summary = None
+        if not summary:
+            summary = extractive_summary(self.summary, evicted)
+        self.summary = summary
+        self.summarized = cutoff
+        return True
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Crisis-language detector that gates every chat message.
+
+A few substring checks on the lowercased text reject most messages at
+about the cost of the old keyword loop. The rest are normalized (case,
+apostrophes, punctuation, whitespace) and go through every crisis pattern
+in a single compiled alternation. Stems match any ending ("hopelessly",
+"suicidally"), so everything the old substring check flagged is still
+flagged. Single-word keywords also get a one-edit typo check ("sucidal",
+"hopeles"), on short messages or when an anchor was seen.
+
+    python crisis.py eval     # precision / recall on crisis_corpus.tsv and crisis_heldout.tsv
+    python crisis.py bench    # µs per message vs the original substring loop
+"""
+
+import os
+import re
+from typing import NamedTuple, Optional
+
+from benchtools import best_time, print_report
+
+# (label, pattern over normalized text). Labels are what gets reported;
+# patterns cover the spelling variants that normalization leaves behind.
+CRISIS_PATTERNS = (
+    ("kill myself", r"kill(?:ing)? my ?self"),
+    ("end my life", r"end(?:ing)? my (?:own )?life"),
+    ("suicide", r"suicid\w*"),
+    ("don't want to live", r"(?:dont|do not) want to (?:live|be alive|be here anymore)"),
+    ("want to die", r"(?:want|wanna|going) to die|wanna die|wish i (?:was|were) dead"),
+    ("self harm", r"self ?harm\w*|hurt(?:ing)? myself|cutting myself"),
+    ("ending it all", r"end(?:ing)? it all"),
+    ("can't go on", r"(?:cant|cannot|can not) go on"),
+    ("hopeless", r"hopeless\w*"),
+    ("better off dead", r"better off dead|better off without me"),
+    ("no reason to live", r"no reason to (?:live|go on)"),
+)
+
+# Weights for the optional scoring layer; anything not listed counts 1.0.
+# Fuzzy (typo) matches count FUZZY_WEIGHT of their phrase's weight.
+PHRASE_WEIGHTS = {"hopeless": 0.6, "can't go on": 0.8}
+FUZZY_WEIGHT = 0.9
+DEFAULT_THRESHOLD = 0.5  # any single match flags the message, as before
+
+# Every pattern above contains one of these literals. They are checked with
+# plain `in` on the lowercased text (the same C substring search the old loop
+# used), so most messages never reach normalization or the full pattern.
+ANCHORS = (
+    "kill", "life", "suicid", "live", "die", "dead", "harm", "myself",
+    "anymore", "it all", "go on", "hopeless", "without me",
+)
+# Messages longer than this (e.g. with conversation context prepended) only
+# get the typo check when an anchor was seen; it is a per-token Python loop.
+FUZZY_MAX_CHARS = 300
+
+# Single words checked with a one-edit typo tolerance, and real words that
+# sit one edit away from them.
+FUZZY_KEYWORDS = {
+    "suicide": "suicide",
+    "suicidal": "suicide",
+    "hopeless": "hopeless",
+    "selfharm": "self harm",
+}
+FUZZY_EXCEPTIONS = {"homeless"}
+
+_TRANSLATE = str.maketrans(
+    {**{c: None for c in "'’‘`´ʼ"}, **{c: " " for c in "!\"#$%&()*+,-./:;<=>?@[\\]^_{|}~…–—“”\t\r\n"}}
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop apostrophes ("don't" -> "dont"), punctuation to spaces, collapse whitespace."""
+    return " ".join(text.lower().translate(_TRANSLATE).split())
+
+
+def _deletes(word: str) -> set:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class CrisisMatch(NamedTuple):
+    phrase: str
+    matched: str  # the normalized text that matched
+    fuzzy: bool
+
+
+class CrisisResult(NamedTuple):
+    is_crisis: bool
+    score: float
+    matches: tuple
+
+    @property
+    def phrases(self) -> list:
+        seen = []
+        for m in self.matches:
+            if m.phrase not in seen:
+                seen.append(m.phrase)
+        return seen
+
+
+class CrisisDetector:
+    """Compiled once at import; scan() is a single regex pass plus an optional typo check."""
+
+    def __init__(
+        self,
+        patterns=CRISIS_PATTERNS,
+        anchors=ANCHORS,
+        fuzzy: bool = True,
+        threshold: float = DEFAULT_THRESHOLD,
+    ):
+        self.labels = {}
+        parts = []
+        for i, (label, pattern) in enumerate(patterns):
+            self.labels[f"p{i}"] = label
+            parts.append(f"(?P<p{i}>{pattern})")
+        self.pattern = re.compile(r"\b(?:" + "|".join(parts) + r")\b")
+        self.anchors = tuple(anchors)
+        self.threshold = threshold
+        self.fuzzy = fuzzy
+        # SymSpell-style index: a token within one edit of a keyword shares a deletion with it
+        self._fuzzy_index = {}
+        for word, label in FUZZY_KEYWORDS.items():
+            for key in _deletes(word) | {word}:
+                self._fuzzy_index.setdefault(key, label)
+        lengths = [len(w) for w in FUZZY_KEYWORDS]
+        self._fuzzy_len = (min(lengths) - 1, max(lengths) + 1)
+        # A single insert, delete or substitution leaves one half of the keyword intact,
+        # so text containing neither half cannot hold a typo of it.
+        self._fuzzy_halves = tuple({h for w in FUZZY_KEYWORDS for h in (w[:len(w) // 2], w[len(w) // 2:])})
+        # typos in the first letter are rare; requiring it lets a regex pick the candidate tokens
+        initials = "".join(sorted({w[0] for w in FUZZY_KEYWORDS}))
+        self._fuzzy_candidates = re.compile(
+            rf"(?<!\S)[{initials}]\S{{{self._fuzzy_len[0] - 1},{self._fuzzy_len[1] - 1}}}(?!\S)"
+        )
+
+    def scan(self, text: str) -> CrisisResult:
+        if not text:
+            return CrisisResult(False, 0.0, ())
+        lowered = text.lower()
+        anchored = any(a in lowered for a in self.anchors)
+        check_typos = (
+            self.fuzzy
+            and (anchored or len(text) <= FUZZY_MAX_CHARS)
+            and any(h in lowered for h in self._fuzzy_halves)
+        )
+        if not anchored and not check_typos:
+            return CrisisResult(False, 0.0, ())
+        norm = normalize(text)
+        matches = []
+        if anchored:
+            matches = [
+                CrisisMatch(self.labels[m.lastgroup], m.group(0), False)
+                for m in self.pattern.finditer(norm)
+            ]
+        if check_typos and not matches:
+            matches = self._fuzzy_matches(norm)
+        score = 0.0
+        for m in matches:
+            weight = PHRASE_WEIGHTS.get(m.phrase, 1.0)
+            score += weight * FUZZY_WEIGHT if m.fuzzy else weight
+        return CrisisResult(score >= self.threshold, score, tuple(matches))
+
+    def __call__(self, text: str) -> bool:
+        return self.scan(text).is_crisis
+
+    def _fuzzy_matches(self, norm: str) -> list:
+        index = self._fuzzy_index
+        out = []
+        for token in self._fuzzy_candidates.findall(norm):
+            if token in FUZZY_EXCEPTIONS:
+                continue
+            label = index.get(token)
+            i = 0
+            while label is None and i < len(token):
+                label = index.get(token[:i] + token[i + 1:])
+                i += 1
+            if label is not None:
+                out.append(CrisisMatch(label, token, True))
+        return out
+
+
+DETECTOR = CrisisDetector()
+
+
+def is_crisis_message(text: str) -> bool:
+    return DETECTOR(text)
+
+
+# ---------- Evaluation / benchmark ----------
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crisis_corpus.tsv")
+# never used for tuning; the number to quote
+HELDOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crisis_heldout.tsv")
+
+# The gate wellness.py had before this detector: plain substring tests on the lowercased message.
+LEGACY_KEYWORDS = [
+    "kill myself", "end my life", "suicidal", "suicide", "don't want to live",
+    "want to die", "self harm", "ending it all", "can't go on", "hopeless",
+]
+
+
+def _legacy_is_crisis(text: str) -> bool:
+    if not text:
+        return False
+    text_lower = text.lower()
+    return any(keyword in text_lower for keyword in LEGACY_KEYWORDS)
+
+
+def load_corpus(path: Optional[str] = None) -> list:
+    """[(label, text)] from a TSV of `1|0<TAB>message`; '#' lines are comments."""
+    rows = []
+    with open(path or CORPUS_PATH, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            label, text = line.split("\t", 1)
+            rows.append((int(label), text))
+    return rows
+
+
+def evaluate(detect, corpus: list) -> dict:
+    tp = fp = fn = tn = 0
+    errors = []
+    for label, text in corpus:
+        predicted = bool(detect(text))
+        if predicted and label:
+            tp += 1
+        elif predicted:
+            fp += 1
+            errors.append(("false_positive", text))
+        elif label:
+            fn += 1
+            errors.append(("false_negative", text))
+        else:
+            tn += 1
+    return {
+        "precision": round(tp / (tp + fp), 3) if tp + fp else None,
+        "recall": round(tp / (tp + fn), 3) if tp + fn else None,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "errors": errors,
+    }
+
+
+def benchmark(corpus: list, repeats: int = 200) -> dict:
+    """Mean µs per message over the corpus for the original loop and the detector."""
+    texts = [t for _, t in corpus]
+    report = {"messages": len(texts)}
+    for name, fn in (("legacy", _legacy_is_crisis), ("detector", DETECTOR.__call__)):
+        def run():
+            for _ in range(repeats):
+                for text in texts:
+                    fn(text)
+
+        report[name + "_us_per_message"] = round(best_time(run) / (repeats * len(texts)) * 1e6, 2)
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EmoCare crisis detector tools")
+    parser.add_argument("command", choices=("eval", "bench"))
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--heldout", default=HELDOUT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "eval":
+        report = {}
+        for name, path in (("development", args.corpus), ("heldout", args.heldout)):
+            rows = load_corpus(path)
+            report[name] = {"legacy": evaluate(_legacy_is_crisis, rows), "detector": evaluate(DETECTOR, rows)}
+    else:
+        report = benchmark(load_corpus(args.corpus))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Bounded conversation history with optional SQLite persistence.
+
+Without a database only the most recent turns are kept in memory. With a
+database path, turns are stored in SQLite under a conversation ID, so a
+conversation survives restarts, and pages are read on demand instead of
+loading everything at start-up.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+
+class Turn:
+    """One message. Supports msg["text"] / msg.get("used_pdf") like the old dict entries."""
+
+    __slots__ = ("role", "text", "ts", "used_pdf")
+
+    def __init__(self, role: str, text: str, ts: float, used_pdf: bool = False):
+        self.role = role
+        self.text = text
+        self.ts = ts
+        self.used_pdf = used_pdf
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.ts).isoformat()
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    conversation TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    ts REAL NOT NULL,
+    used_pdf INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS turns_by_conversation ON turns (conversation, id);
+"""
+
+
+class HistoryStore:
+    """Append-only turn log for one conversation.
+
+    Indexing and slicing use positions in the whole conversation. Without
+    a database, only the last `max_in_memory` turns are kept and slices
+    skip positions that have left that window. With a database, counts and
+    reads come from SQLite, so two sessions writing to the same
+    conversation (e.g. two tabs) never disagree about positions.
+    Use `recent()` for display.
+    """
+
+    def __init__(self, max_in_memory: int = 200, db_path: Optional[str] = None, conversation: str = "default"):
+        self._turns = deque(maxlen=max_in_memory)
+        self._lock = threading.Lock()
+        self.conversation = conversation
+        self._db = None
+        self._total = 0  # in-memory mode only
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def __len__(self):
+        if self._db is not None:
+            with self._lock:
+                return self._db.execute(
+                    "SELECT COUNT(*) FROM turns WHERE conversation = ?", (self.conversation,)
+                ).fetchone()[0]
+        return self._total
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        total = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(total)
+            if self._db is not None:
+                turns = self._fetch(start, stop - start) if stop > start else []
+                return turns[::step]
+            first = total - len(self._turns)
+            start = max(start, first)
+            return [self._turns[i - first] for i in range(start, stop, step) if i >= first]
+        if index < 0:
+            index += total
+        if not 0 <= index < total:
+            raise IndexError("turn index out of range")
+        if self._db is not None:
+            return self._fetch(index, 1)[0]
+        first = total - len(self._turns)
+        if index < first:
+            raise IndexError("turn is not in memory; use recent()")
+        return self._turns[index - first]
+
+    def append(self, role: str, text: str, used_pdf: bool = False) -> Turn:
+        turn = Turn(role, text, time.time(), used_pdf)
+        with self._lock:
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT INTO turns (conversation, role, text, ts, used_pdf) VALUES (?, ?, ?, ?, ?)",
+                        (self.conversation, role, text, turn.ts, int(used_pdf)),
+                    )
+            else:
+                self._turns.append(turn)
+                self._total += 1
+        return turn
+
+    def available(self) -> int:
+        """How many turns recent() can return (all of them when persisted)."""
+        return len(self) if self._db is not None else len(self._turns)
+
+    def recent(self, n: int) -> list:
+        """The last `n` turns, oldest first."""
+        if self._db is not None:
+            total = len(self)
+            n = min(n, total)
+            return self._fetch(total - n, n)
+        n = min(n, len(self._turns))
+        return list(self._turns)[-n:] if n else []
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._total = 0
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM turns WHERE conversation = ?", (self.conversation,))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _fetch(self, start: int, count: int) -> list:
+        start = max(0, start)
+        if self._db is None or count <= 0:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, text, ts, used_pdf FROM turns WHERE conversation = ? ORDER BY id LIMIT ? OFFSET ?",
+                (self.conversation, count, start),
+            ).fetchall()
+        return [Turn(role, text, ts, bool(used_pdf)) for role, text, ts, used_pdf in rows]
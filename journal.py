@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Journal PDF helpers: page-streamed extraction, chunking and retrieval."""
+
+import io
+import multiprocessing
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+import PyPDF2
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+_WORD = re.compile(r"\S+")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for English prompt budgeting
+    return max(1, len(text) // 4)
+
+
+# ---------- Streaming PDF extraction ----------
+MAX_PDF_BYTES = 25 * 1024 * 1024
+MAX_PDF_PAGES = 400
+MAX_JOURNAL_CHARS = 2_000_000
+PAGES_PER_TASK = 8
+PARALLEL_MIN_PAGES = 200  # spawned workers re-import numpy/sklearn (~1.5 s); below this serial wins
+
+
+class PDFPage(NamedTuple):
+    number: int  # 0-based
+    text: str
+    pages_read: int  # pages that will be read (after the page limit)
+    pages_total: int  # pages in the file
+
+
+def _page_text(page) -> str:
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        # one malformed page shouldn't sink the whole upload
+        return ""
+
+
+_worker_reader = None
+
+
+def _init_worker(data: bytes):
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _extract_range(start: int, stop: int) -> list:
+    return [_page_text(_worker_reader.pages[i]) for i in range(start, stop)]
+
+
+def iter_pdf_pages(data: bytes, max_pages: int = MAX_PDF_PAGES, workers: int = 1):
+    """Yield PDFPage items in page order as they are extracted.
+
+    Serial by default. PyPDF2 parsing is CPU-bound, so with `workers` > 1
+    and enough pages the pages are fanned out to a process pool in batches
+    (each worker parses the file once). Workers are spawned, not forked:
+    the caller (the Streamlit server) has live threads, and forking those
+    can deadlock. Falls back to serial extraction if the pool can't run.
+    """
+    if len(data) > MAX_PDF_BYTES:
+        raise ValueError(
+            f"PDF is {len(data) / 1e6:.1f} MB; the limit is {MAX_PDF_BYTES / 1e6:.0f} MB."
+        )
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    pages_total = len(reader.pages)
+    pages_read = min(pages_total, max_pages)
+
+    done = 0
+    if workers > 1 and pages_read >= PARALLEL_MIN_PAGES:
+        starts = list(range(0, pages_read, PAGES_PER_TASK))
+        stops = [min(s + PAGES_PER_TASK, pages_read) for s in starts]
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(data,),
+            ) as pool:
+                for texts in pool.map(_extract_range, starts, stops):
+                    for text in texts:
+                        yield PDFPage(done, text, pages_read, pages_total)
+                        done += 1
+        except (BrokenProcessPool, OSError):
+            pass  # finish serially from wherever the pool stopped
+    for i in range(done, pages_read):
+        yield PDFPage(i, _page_text(reader.pages[i]), pages_read, pages_total)
+
+
+# ---------- Chunking ----------
+class ChunkBuilder:
+    """Incremental version of chunk_text: feed page text, collect overlapping word windows."""
+
+    def __init__(self, words_per_chunk: int = 120, overlap: int = 30):
+        self.words_per_chunk = words_per_chunk
+        self.step = max(1, words_per_chunk - overlap)
+        self.chunks = []
+        self._words = []
+
+    def feed(self, text: str):
+        self._words.extend(_WORD.findall(text or ""))
+        while len(self._words) >= self.words_per_chunk:
+            self.chunks.append(" ".join(self._words[:self.words_per_chunk]))
+            del self._words[:self.step]
+
+    def finish(self) -> list:
+        # the tail is only a new chunk if it has words not already in the last window
+        if self._words and (not self.chunks or len(self._words) > self.words_per_chunk - self.step):
+            self.chunks.append(" ".join(self._words))
+        self._words = []
+        return self.chunks
+
+
+def chunk_text(text: str, words_per_chunk: int = 120, overlap: int = 30) -> list:
+    """Split text into overlapping word windows (overlap keeps sentences that straddle a boundary)."""
+    builder = ChunkBuilder(words_per_chunk, overlap)
+    builder.feed(text)
+    return builder.finish()
+
+
+# ---------- Retrieval ----------
+class Retrieved(NamedTuple):
+    text: str
+    score: float
+    chunk_id: int
+
+
+class JournalIndex:
+    """TF-IDF index over journal chunks; built once per uploaded file."""
+
+    def __init__(self, text: str = "", words_per_chunk: int = 120, overlap: int = 30, chunks: Optional[list] = None):
+        t0 = time.perf_counter()
+        self.chunks = chunks if chunks is not None else chunk_text(text, words_per_chunk, overlap)
+        self._vectorizer = None
+        self._matrix = None
+        if self.chunks:
+            self._vectorizer = TfidfVectorizer(
+                stop_words=list(ENGLISH_STOP_WORDS),
+                sublinear_tf=True,
+                ngram_range=(1, 2),
+                min_df=1,
+            )
+            try:
+                self._matrix = self._vectorizer.fit_transform(self.chunks)
+            except ValueError:
+                # only stop words / no vocabulary
+                self._vectorizer = None
+        self.build_ms = (time.perf_counter() - t0) * 1000.0
+        self.last_query_ms = None
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query: str, k: int = 4, token_budget: int = 600, min_score: float = 0.02) -> list:
+        """Top-k chunks for `query`, best first, stopping before `token_budget` is exceeded."""
+        t0 = time.perf_counter()
+        results = []
+        if self._vectorizer is not None and query and query.strip():
+            q = self._vectorizer.transform([query])
+            # rows are L2-normalized, so the sparse dot product is cosine similarity
+            scores = (self._matrix @ q.T).toarray().ravel()
+            if scores.size:
+                k = min(k, scores.size)
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                used = 0
+                for i in top:
+                    score = float(scores[i])
+                    if score < min_score:
+                        break
+                    cost = estimate_tokens(self.chunks[i])
+                    if used + cost > token_budget:
+                        break
+                    results.append(Retrieved(self.chunks[i], score, int(i)))
+                    used += cost
+        self.last_query_ms = (time.perf_counter() - t0) * 1000.0
+        return results
+
+    def context_for(self, query: str, k: int = 4, token_budget: int = 600) -> Optional[str]:
+        """Prompt-ready excerpt block, in journal order, or None if nothing relevant."""
+        hits = self.search(query, k=k, token_budget=token_budget)
+        if not hits:
+            return None
+        hits.sort(key=lambda r: r.chunk_id)
+        return "\n---\n".join(r.text for r in hits)
+
+
+# ---------- Upload pipeline ----------
+def process_journal(
+    data: bytes,
+    redact: Callable[[str], tuple],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    max_pages: int = MAX_PDF_PAGES,
+    max_chars: int = MAX_JOURNAL_CHARS,
+    workers: int = 1,
+) -> dict:
+    """Extract, redact and chunk a PDF page by page, then fit the retrieval index.
+
+    `redact(text) -> (text, {label: count})` runs on each page as it
+    arrives; `on_progress(done, total)` is called after every page.
+    """
+    t0 = time.perf_counter()
+    parts = []
+    chars = 0
+    redactions = {}
+    builder = ChunkBuilder()
+    pages_read = pages_total = 0
+    truncated = False
+    for page in iter_pdf_pages(data, max_pages=max_pages, workers=workers):
+        text, counts = redact(page.text)
+        if chars + len(text) > max_chars:
+            text = text[:max_chars - chars]
+            truncated = True
+        parts.append(text)
+        chars += len(text)
+        builder.feed(text)
+        for label, n in counts.items():
+            redactions[label] = redactions.get(label, 0) + n
+        pages_read, pages_total = page.number + 1, page.pages_total
+        if on_progress is not None:
+            on_progress(pages_read, page.pages_read)
+        if truncated:
+            break
+    extract_ms = (time.perf_counter() - t0) * 1000.0
+    return {
+        "text": "\n".join(parts),
+        "redactions": redactions,
+        "index": JournalIndex(chunks=builder.finish()),
+        "pages_read": pages_read,
+        "pages_total": pages_total,
+        "truncated": truncated or pages_read < pages_total,
+        "extract_ms": extract_ms,
+    }
+
+
+class JournalStore:
+    """Small thread-safe LRU of processed uploads, keyed on file content hash."""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key: str, item: dict):
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
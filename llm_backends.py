@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""LLM backend selection and per-task model routing.
+
+Two backends are supported:
+
+- ``groq``   (default): the Groq API through ``AsyncGroq``.
+- ``openai``: any OpenAI-compatible ``/v1/chat/completions`` server, e.g.
+  llama.cpp's ``llama-server`` on a Jetson, vLLM, or ``mock_llm_server.py``.
+  Uses a small httpx client, so no extra SDK is needed.
+
+Settings come from environment variables, optionally overlaid with a JSON
+file named by ``EMOCARE_LLM_CONFIG``::
+
+    {"backend": "openai", "base_url": "http://127.0.0.1:8080/v1",
+     "routes": {"chat": {"model": "llama-3.2-3b"}, "joke": {"max_tokens": 80}}}
+"""
+
+import json
+import os
+from types import SimpleNamespace
+from typing import NamedTuple, Optional
+
+import httpx
+
+# Tasks the app asks for; labels not listed here use the "chat" route.
+TASKS = ("chat", "joke", "calm_quest", "summary")
+TASK_ALIASES = {"voice": "chat"}
+
+GROQ_DEFAULT_MODELS = {
+    "chat": "llama-3.3-70b-versatile",
+    # short, low-stakes generations go to the smaller, faster model
+    "joke": "llama-3.1-8b-instant",
+    "calm_quest": "llama-3.1-8b-instant",
+    "summary": "llama-3.1-8b-instant",
+}
+DEFAULT_TEMPERATURES = {"chat": 0.7, "joke": 0.9, "calm_quest": 0.7, "summary": 0.3}
+DEFAULT_MAX_TOKENS = {"chat": 1500, "joke": 120, "calm_quest": 600, "summary": 300}
+
+
+class Route(NamedTuple):
+    model: str
+    temperature: float
+    max_tokens: int
+
+
+class LLMConfig:
+    """Backend connection settings plus one Route per task."""
+
+    def __init__(self, backend: str, routes: dict, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        self.backend = backend
+        self.routes = routes
+        self.base_url = base_url
+        self.api_key = api_key
+
+    def route(self, task: str) -> Route:
+        task = TASK_ALIASES.get(task, task)
+        return self.routes.get(task) or self.routes["chat"]
+
+    def describe(self) -> str:
+        where = self.base_url if self.backend == "openai" else "Groq API"
+        models = ", ".join(f"{task} → {r.model}" for task, r in self.routes.items())
+        return f"{self.backend} ({where}) · {models}"
+
+
+def load_llm_config(env=None) -> LLMConfig:
+    """Build the config from EMOCARE_* variables and the optional JSON file.
+
+    Env: EMOCARE_LLM_BACKEND, EMOCARE_LLM_BASE_URL, EMOCARE_LLM_API_KEY,
+    EMOCARE_LLM_MODEL (default for every task) and EMOCARE_MODEL_<TASK>
+    (e.g. EMOCARE_MODEL_JOKE). GROQ_API_KEY is used for the groq backend.
+    """
+    env = os.environ if env is None else env
+    file_cfg = {}
+    path = env.get("EMOCARE_LLM_CONFIG")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            file_cfg = json.load(f)
+
+    backend = (file_cfg.get("backend") or env.get("EMOCARE_LLM_BACKEND") or "groq").lower()
+    if backend not in ("groq", "openai"):
+        raise ValueError(f"Unknown LLM backend {backend!r}; use 'groq' or 'openai'.")
+    base_url = file_cfg.get("base_url") or env.get("EMOCARE_LLM_BASE_URL")
+    if backend == "openai" and not base_url:
+        base_url = "http://127.0.0.1:8080/v1"
+    api_key = file_cfg.get("api_key") or env.get("EMOCARE_LLM_API_KEY")
+    if backend == "groq":
+        api_key = api_key or env.get("GROQ_API_KEY")
+
+    default_model = file_cfg.get("model") or env.get("EMOCARE_LLM_MODEL")
+    routes = {}
+    for task in TASKS:
+        override = file_cfg.get("routes", {}).get(task, {})
+        model = (
+            override.get("model")
+            or env.get(f"EMOCARE_MODEL_{task.upper()}")
+            or default_model
+            or (GROQ_DEFAULT_MODELS[task] if backend == "groq" else "local")
+        )
+        routes[task] = Route(
+            model=model,
+            temperature=float(override.get("temperature", DEFAULT_TEMPERATURES[task])),
+            max_tokens=int(override.get("max_tokens", DEFAULT_MAX_TOKENS[task])),
+        )
+    return LLMConfig(backend, routes, base_url=base_url, api_key=api_key)
+
+
+# ---------- OpenAI-compatible client ----------
+def _chunk(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class _SSEStream:
+    """Async iterator over a streamed chat completion (server-sent events)."""
+
+    def __init__(self, client: httpx.AsyncClient, request: httpx.Request):
+        self._client = client
+        self._request = request
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        response = await self._client.send(self._request, stream=True)
+        try:
+            if response.status_code >= 400:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                payload = json.loads(data)
+                for choice in payload.get("choices") or ():
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield _chunk(content)
+        finally:
+            await response.aclose()
+
+
+class OpenAICompatClient:
+    """Just enough of AsyncOpenAI for LLMGateway: chat.completions.create(stream=True)."""
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, max_connections: int = 16):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, stream: bool = True, **params):
+        if not stream:
+            raise ValueError("OpenAICompatClient only supports streaming")
+        request = self._http.build_request("POST", "/chat/completions", json={**params, "stream": True})
+        stream = _SSEStream(self._http, request)
+        # Open the connection now so HTTP errors (429/5xx) surface here, where the gateway retries
+        iterator = stream.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return _Prefetched(first, iterator)
+
+
+class _Prefetched:
+    def __init__(self, first, rest):
+        self._first = first
+        self._rest = rest
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        if self._first is not None:
+            yield self._first
+        async for chunk in self._rest:
+            yield chunk
+
+
+def create_client(config: LLMConfig):
+    """Async client for the configured backend, or None if it can't be used (no Groq key)."""
+    if config.backend == "openai":
+        return OpenAICompatClient(config.base_url, config.api_key)
+    if not config.api_key:
+        return None
+    from groq import AsyncGroq
+
+    # the gateway does its own retries, so the SDK's are off
+    return AsyncGroq(api_key=config.api_key, max_retries=0)
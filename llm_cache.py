@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Response cache for deterministic / repeated LLM prompts.
+
+Exact hits are keyed on a normalized (system_prompt, user_text, model,
+temperature) tuple. An optional near-duplicate mode compares the user text
+against cached entries for the same system prompt with TF-IDF cosine
+similarity. Callers whose exact scope carries the chat history pass a
+shorter `near_scope` (the bare system prompt) so rewordings still match
+after the first turn.
+"""
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    text = _WS.sub(" ", (text or "").strip())
+    return text.casefold() if casefold else text
+
+
+class _Entry:
+    __slots__ = ("scope", "near_scope", "user_norm", "pool", "next", "expires_at")
+
+    def __init__(self, scope, near_scope, user_norm, expires_at):
+        self.scope = scope
+        self.near_scope = near_scope
+        self.user_norm = user_norm
+        self.pool = []
+        self.next = 0
+        self.expires_at = expires_at
+
+
+class LLMResponseCache:
+    """LRU + TTL cache of LLM replies.
+
+    `pool_size` lets one key hold several replies: lookups miss until the
+    pool is full, then rotate through it (used for joke variety).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 6 * 3600,
+        near_duplicate: bool = False,
+        similarity: float = 0.9,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_duplicate = near_duplicate
+        self.similarity = similarity
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def _scope(system_prompt: str, model: str, temperature: float) -> str:
+        raw = json.dumps([normalize_text(system_prompt), model, round(float(temperature), 3)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _key(self, scope: str, user_norm: str) -> str:
+        return hashlib.sha256((scope + "\0" + user_norm).encode("utf-8")).hexdigest()
+
+    def lookup(
+        self, system_prompt, user_text, model, temperature, pool_size: int = 1, near_scope: Optional[str] = None
+    ) -> Optional[str]:
+        self._expire()
+        scope = self._scope(system_prompt, model, temperature)
+        user_norm = normalize_text(user_text, casefold=True)
+        entry = self._entries.get(self._key(scope, user_norm))
+        near = False
+        if entry is None and self.near_duplicate:
+            near_key = scope if near_scope is None else self._scope(near_scope, model, temperature)
+            entry = self._nearest(near_key, user_norm)
+            near = entry is not None
+
+        if entry is None or len(entry.pool) < max(1, pool_size):
+            self.stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(self._key(entry.scope, entry.user_norm))
+        reply = entry.pool[entry.next % len(entry.pool)]
+        entry.next += 1
+        self.stats["near_hits" if near else "hits"] += 1
+        return reply
+
+    def store(
+        self, system_prompt, user_text, model, temperature, reply: str, pool_size: int = 1,
+        near_scope: Optional[str] = None,
+    ):
+        if not reply:
+            return
+        scope = self._scope(system_prompt, model, temperature)
+        near_key = scope if near_scope is None else self._scope(near_scope, model, temperature)
+        user_norm = normalize_text(user_text, casefold=True)
+        key = self._key(scope, user_norm)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(scope, near_key, user_norm, time.time() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        if reply not in entry.pool:
+            entry.pool.append(reply)
+        del entry.pool[:-max(1, pool_size)]
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def note_bypass(self):
+        self.stats["bypassed"] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        out = dict(self.stats)
+        lookups = out["hits"] + out["near_hits"] + out["misses"]
+        out["hit_rate"] = (out["hits"] + out["near_hits"]) / lookups if lookups else None
+        out["entries"] = len(self._entries)
+        return out
+
+    def _expire(self):
+        now = time.time()
+        expired = [k for k, e in self._entries.items() if e.expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+
+    def _nearest(self, near_key, user_norm) -> Optional[_Entry]:
+        candidates = [e for e in self._entries.values() if e.near_scope == near_key]
+        if not candidates:
+            return None
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.metrics.pairwise import linear_kernel
+        except ImportError:
+            return None
+        try:
+            matrix = TfidfVectorizer(ngram_range=(1, 2)).fit_transform(
+                [user_norm] + [e.user_norm for e in candidates]
+            )
+        except ValueError:
+            # empty vocabulary (e.g. only stop characters)
+            return None
+        # TF-IDF rows are L2-normalized, so the linear kernel is cosine similarity
+        sims = linear_kernel(matrix[0:1], matrix[1:]).ravel()
+        best = int(sims.argmax())
+        return candidates[best] if sims[best] >= self.similarity else None
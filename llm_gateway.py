@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Shared LLM gateway: one async client, bounded concurrency, deadlines, retries.
+
+All sessions share one gateway (and so one pooled HTTP client). Requests
+run as coroutines on a private event-loop thread; Streamlit code consumes
+them through ordinary blocking iterators. Identical prompts that are in
+flight at the same time are coalesced onto a single upstream request.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Iterator, Optional
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Base class; `kind` is one of "timeout", "rate_limited", "unavailable", "error"."""
+
+    kind = "error"
+
+
+class LLMTimeout(LLMError):
+    kind = "timeout"
+
+
+class LLMRateLimited(LLMError):
+    kind = "rate_limited"
+
+
+class LLMUnavailable(LLMError):
+    kind = "unavailable"
+
+
+def _status_code(exc) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def _retry_after(exc) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _classify(exc) -> LLMError:
+    if isinstance(exc, LLMError):
+        return exc
+    if isinstance(exc, asyncio.TimeoutError) or "Timeout" in type(exc).__name__:
+        return LLMTimeout(str(exc) or "LLM request timed out")
+    code = _status_code(exc)
+    if code == 429:
+        return LLMRateLimited(str(exc))
+    if (code is not None and code >= 500) or "Connect" in type(exc).__name__:
+        return LLMUnavailable(str(exc))
+    return LLMError(str(exc))
+
+
+def _retryable(exc) -> bool:
+    if isinstance(exc, (LLMTimeout, LLMRateLimited, LLMUnavailable)):
+        return True
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    name = type(exc).__name__
+    return _status_code(exc) in RETRYABLE_STATUS or "Timeout" in name or "Connect" in name
+
+
+class _Flight:
+    """One upstream request; any number of readers follow its chunks."""
+
+    __slots__ = ("chunks", "done", "error", "cond", "readers", "future")
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.readers = 0
+        self.future = None
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMGateway:
+    """Streams chat completions from an OpenAI-style async client.
+
+    `client` needs `client.chat.completions.create(..., stream=True)` as a
+    coroutine returning an async iterator of chunks (AsyncGroq, AsyncOpenAI).
+    Retries (jittered exponential backoff, honouring Retry-After) only
+    happen before the first token, so a reader never sees repeated text.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_concurrency: int = 4,
+        deadline_s: float = 60.0,
+        first_token_s: float = 20.0,
+        chunk_timeout_s: float = 15.0,
+        max_retries: int = 3,
+        backoff_base_s: float = 0.5,
+        backoff_cap_s: float = 8.0,
+    ):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.deadline_s = deadline_s
+        self.first_token_s = first_token_s
+        self.chunk_timeout_s = chunk_timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_cap_s = backoff_cap_s
+
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._semaphore = None  # created on the loop thread
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="emocare-llm", daemon=True)
+        self._thread.start()
+
+        self.stats = {
+            "requests": 0,
+            "upstream": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rate_limited": 0,
+            "errors": 0,
+            "cancelled": 0,
+        }
+        self._in_flight = 0
+        self._latency_ms = deque(maxlen=200)
+        self._ttft_ms = deque(maxlen=200)
+        self._queue_ms = deque(maxlen=200)
+
+    # ---- public, called from script threads ----
+    def stream(self, messages: list, model: str, temperature: float = 0.7, max_tokens: int = 1500,
+               coalesce: bool = True) -> Iterator[str]:
+        """Yield reply chunks; raises LLMError subclasses instead of returning error text."""
+        params = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        key = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock:
+            self.stats["requests"] += 1
+            flight = self._flights.get(key) if coalesce else None
+            if flight is not None:
+                self.stats["coalesced"] += 1
+            else:
+                flight = _Flight()
+                if coalesce:
+                    self._flights[key] = flight
+                flight.future = asyncio.run_coroutine_threadsafe(self._run(key, flight, params), self._loop)
+            flight.readers += 1
+        return self._follow(flight)
+
+    def complete(self, messages: list, model: str, temperature: float = 0.7, max_tokens: int = 1500,
+                 coalesce: bool = True) -> str:
+        return "".join(self.stream(messages, model, temperature, max_tokens, coalesce))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = dict(self.stats)
+            out["in_flight"] = self._in_flight
+            latency, ttft, queue = list(self._latency_ms), list(self._ttft_ms), list(self._queue_ms)
+        out["latency_p50_ms"] = _percentile(latency, 0.5)
+        out["latency_p95_ms"] = _percentile(latency, 0.95)
+        out["ttft_p50_ms"] = _percentile(ttft, 0.5)
+        out["ttft_p95_ms"] = _percentile(ttft, 0.95)
+        out["queue_p95_ms"] = _percentile(queue, 0.95)
+        return out
+
+    def close(self):
+        try:
+            asyncio.run_coroutine_threadsafe(self._loop.shutdown_asyncgens(), self._loop).result(timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ---- readers ----
+    def _follow(self, flight: _Flight) -> Iterator[str]:
+        deadline = time.monotonic() + self.deadline_s + 1.0  # the producer enforces the real deadline
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index >= len(flight.chunks) and not flight.done:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise LLMTimeout("LLM request exceeded its deadline")
+                        flight.cond.wait(remaining)
+                    new = flight.chunks[index:]
+                    finished = flight.done
+                    error = flight.error
+                index += len(new)
+                for chunk in new:
+                    yield chunk
+                if finished and index >= len(flight.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._lock:
+                flight.readers -= 1
+                abandoned = flight.readers == 0 and not flight.done
+            if abandoned and flight.future is not None:
+                # nobody is listening any more (e.g. the user navigated away)
+                flight.future.cancel()
+
+    # ---- producer, runs on the loop thread ----
+    def _publish(self, flight: _Flight, chunk: Optional[str] = None, error: Optional[Exception] = None,
+                 done: bool = False):
+        with flight.cond:
+            if chunk:
+                flight.chunks.append(chunk)
+            if error is not None:
+                flight.error = error
+            if done:
+                flight.done = True
+            flight.cond.notify_all()
+
+    async def _run(self, key: str, flight: _Flight, params: dict):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        started = time.monotonic()
+        deadline = started + self.deadline_s
+        first_token_at = None
+        error = None
+        try:
+            async with self._semaphore:
+                queued_ms = (time.monotonic() - started) * 1000.0
+                with self._lock:
+                    self._in_flight += 1
+                    self._queue_ms.append(queued_ms)
+                try:
+                    for attempt in range(self.max_retries + 1):
+                        try:
+                            with self._lock:
+                                self.stats["upstream"] += 1
+                            first_token_at = await self._attempt(flight, params, deadline, started)
+                            break
+                        except asyncio.CancelledError:
+                            raise
+                        except Exception as exc:
+                            if flight.chunks or attempt >= self.max_retries or not _retryable(exc):
+                                raise
+                            delay = random.uniform(0, min(self.backoff_cap_s, self.backoff_base_s * 2 ** attempt))
+                            delay = max(delay, _retry_after(exc) or 0.0)
+                            if time.monotonic() + delay >= deadline:
+                                raise
+                            with self._lock:
+                                self.stats["retries"] += 1
+                            await asyncio.sleep(delay)
+                finally:
+                    with self._lock:
+                        self._in_flight -= 1
+        except asyncio.CancelledError:
+            with self._lock:
+                self.stats["cancelled"] += 1
+            error = LLMError("LLM request was cancelled")
+        except Exception as exc:
+            error = _classify(exc)
+            with self._lock:
+                if error.kind == "timeout":
+                    self.stats["timeouts"] += 1
+                elif error.kind == "rate_limited":
+                    self.stats["rate_limited"] += 1
+                self.stats["errors"] += 1
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                self._latency_ms.append((time.monotonic() - started) * 1000.0)
+                if first_token_at is not None:
+                    self._ttft_ms.append((first_token_at - started) * 1000.0)
+            self._publish(flight, error=error, done=True)
+
+    async def _attempt(self, flight: _Flight, params: dict, deadline: float, started: float) -> Optional[float]:
+        def budget(limit: float) -> float:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeout("LLM request exceeded its deadline")
+            return min(limit, remaining)
+
+        stream = await asyncio.wait_for(
+            self.client.chat.completions.create(stream=True, **params),
+            budget(self.first_token_s),
+        )
+        first_token_at = None
+        iterator = stream.__aiter__()
+        while True:
+            limit = self.chunk_timeout_s if first_token_at is not None else self.first_token_s
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), budget(limit))
+            except StopAsyncIteration:
+                return first_token_at
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                self._publish(flight, chunk=delta)
+
+
+def format_gateway_stats(snap: dict) -> str:
+    def ms(v):
+        return "–" if v is None else f"{v:.0f} ms"
+
+    return (
+        f"{snap['requests']} requests ({snap['coalesced']} coalesced, {snap['in_flight']} in flight) · "
+        f"latency p50/p95 {ms(snap['latency_p50_ms'])}/{ms(snap['latency_p95_ms'])} · "
+        f"TTFT p50 {ms(snap['ttft_p50_ms'])} · retries {snap['retries']} · "
+        f"errors {snap['errors']} ({snap['timeouts']} timeouts, {snap['rate_limited']} rate-limited)"
+    )
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""OpenAI-compatible stand-in server that replays canned replies, plus a load test.
+
+    python mock_llm_server.py serve --port 8081 --ttft-ms 300 --chunk-ms 30
+    EMOCARE_LLM_BACKEND=openai EMOCARE_LLM_BASE_URL=http://127.0.0.1:8081/v1 streamlit run wellness.py
+
+    python mock_llm_server.py bench --requests 200 --sessions 16 --concurrency 4
+
+`bench` starts the server in-process (or targets --base-url) and drives it
+through LLMGateway, so it measures the app's own client path end to end
+without touching the network.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchtools import print_report
+
+CANNED = {
+    "joke": [
+        "Why did the cloud break up with the fog? It needed some space to clear its head. ☁️",
+        "I told my plant a joke. It didn't laugh, but it's definitely growing on me. 🌱",
+    ],
+    "summary": [
+        "The user has been feeling stressed about work and is trying short breathing breaks.",
+    ],
+    "chat": [
+        "Thank you for sharing that with me. It sounds like today has been heavy. "
+        "One tiny step could be a slow breath in for four counts and out for six. "
+        "What part of the day felt hardest?",
+        "That makes a lot of sense. Noticing how you feel is already a good step. "
+        "Would a two-minute walk or a glass of water help right now?",
+    ],
+}
+
+
+def _task_for(messages: list) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system").lower()
+    if "joke" in system:
+        return "joke"
+    if "summary" in system:
+        return "summary"
+    return "chat"
+
+
+class MockLLM:
+    """Reply source and latency model shared by all handler threads."""
+
+    def __init__(self, canned=None, ttft_ms: float = 250.0, chunk_ms: float = 25.0, error_rate: float = 0.0,
+                 seed: int = 0):
+        self.canned = canned or CANNED
+        self.ttft_ms = ttft_ms
+        self.chunk_ms = chunk_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._cycles = {task: itertools.cycle(replies) for task, replies in self.canned.items()}
+        self._lock = threading.Lock()
+        self.served = 0
+
+    def reply_for(self, messages: list) -> str:
+        task = _task_for(messages)
+        with self._lock:
+            self.served += 1
+            return next(self._cycles.get(task) or self._cycles["chat"])
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+def make_handler(mock: MockLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so the client's connection pool is exercised
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, status: int, payload: dict, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+            else:
+                self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if mock.should_fail():
+                status = random.choice((429, 503))
+                self._json(status, {"error": {"message": "mock failure"}}, headers={"Retry-After": "0"})
+                return
+
+            reply = mock.reply_for(request.get("messages") or [])
+            model = request.get("model") or "mock"
+            time.sleep(mock.ttft_ms / 1000.0)
+            if not request.get("stream"):
+                self._json(200, {
+                    "object": "chat.completion",
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(mock.chunk_ms / 1000.0)
+                delta = {"content": word if i == 0 else " " + word}
+                event = {"object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self._chunk(f"data: {json.dumps(event)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(mock: MockLLM, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+
+# ---------- Load test ----------
+def run_load_test(base_url: str, requests: int = 100, sessions: int = 8, concurrency: int = 4,
+                  same_prompt: bool = False) -> dict:
+    """Drive `requests` chat calls from `sessions` threads through LLMGateway."""
+    from llm_backends import OpenAICompatClient
+    from llm_gateway import LLMError, LLMGateway
+
+    gateway = LLMGateway(OpenAICompatClient(base_url), max_concurrency=concurrency)
+    counter = itertools.count()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def session():
+        while True:
+            n = next(counter)
+            if n >= requests:
+                return
+            prompt = "I feel a bit stressed today." if same_prompt else f"Message {n}: I feel a bit stressed today."
+            messages = [{"role": "system", "content": "You are EmoCare."}, {"role": "user", "content": prompt}]
+            t0 = time.perf_counter()
+            try:
+                gateway.complete(messages, model="mock", max_tokens=200)
+                with lock:
+                    latencies.append((time.perf_counter() - t0) * 1000.0)
+            except LLMError as e:
+                with lock:
+                    errors.append(e.kind)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    gateway.close()
+
+    latencies.sort()
+
+    def pct(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 1) if latencies else None
+
+    return {
+        "requests": requests,
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_p50_ms": pct(0.5),
+        "latency_p95_ms": pct(0.95),
+        "errors": {kind: errors.count(kind) for kind in set(errors)},
+        "gateway": gateway.snapshot(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server for EmoCare")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def latency_args(p):
+        p.add_argument("--ttft-ms", type=float, default=250.0, help="Delay before the first chunk")
+        p.add_argument("--chunk-ms", type=float, default=25.0, help="Delay between streamed words")
+        p.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 429/503")
+        p.add_argument("--responses", help="JSON file of {task: [replies]} (tasks: chat, joke, summary)")
+
+    serve = sub.add_parser("serve", help="Run the server until interrupted")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8081)
+    latency_args(serve)
+
+    bench = sub.add_parser("bench", help="Load-test the gateway against the mock server")
+    bench.add_argument("--base-url", help="Use an already running server instead of starting one")
+    bench.add_argument("--requests", type=int, default=100)
+    bench.add_argument("--sessions", type=int, default=8, help="Concurrent simulated users")
+    bench.add_argument("--concurrency", type=int, default=4, help="Gateway concurrency limit")
+    bench.add_argument("--same-prompt", action="store_true", help="Send identical prompts (exercises coalescing)")
+    latency_args(bench)
+
+    args = parser.parse_args(argv)
+    canned = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            canned = json.load(f)
+    mock = MockLLM(canned, ttft_ms=args.ttft_ms, chunk_ms=args.chunk_ms, error_rate=args.error_rate)
+
+    if args.command == "serve":
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(mock))
+        print(f"Mock LLM listening on http://{args.host}:{server.server_address[1]}/v1")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        server = None
+        base_url = args.base_url
+        if not base_url:
+            server = start_server(mock)
+            base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        report = run_load_test(base_url, args.requests, args.sessions, args.concurrency, args.same_prompt)
+        print_report(report)
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Speculative prefetch: keep a few generated items ready for the current key.
+
+Used for jokes: while the user looks at the page, a background thread asks
+the LLM for the next joke for the current (mood, companion) pair, so the
+button can answer from the pool instead of waiting on a round trip.
+Changing the key drops the pool and cancels queued jobs for the old key;
+a job already running finishes, and its result is discarded.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+
+
+class Prefetcher:
+    """Pool of ready items for one key, refilled on a worker thread.
+
+    `produce(key)` runs off the script thread, so it must not call
+    Streamlit; it returns the item, or a falsy value to skip it.
+    """
+
+    def __init__(self, produce: Callable[[Hashable], Optional[str]], pool_size: int = 1, max_failures: int = 3):
+        self.produce = produce
+        self.pool_size = pool_size
+        self.max_failures = max_failures
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="emocare-prefetch")
+        self._lock = threading.Lock()
+        self._key = None
+        self._generation = 0  # bumped on invalidate; stale results are dropped
+        self._ready = deque()
+        self._futures = []  # submitted for the current key
+        self._pending = 0
+        self._failures = 0  # consecutive; stops refilling until the key changes or an item is taken
+
+        self.stats = {"hits": 0, "misses": 0, "produced": 0, "discarded": 0, "errors": 0}
+        self._produce_ms = deque(maxlen=50)
+
+    def set_key(self, key: Hashable):
+        """Switch to `key`, dropping everything prefetched for another one."""
+        with self._lock:
+            if key == self._key:
+                return
+            self._key = key
+            self._generation += 1
+            self.stats["discarded"] += len(self._ready)
+            self._ready.clear()
+            for future in self._futures:
+                future.cancel()  # queued jobs for the old key never start
+            self._futures = []
+            self._pending = 0
+            self._failures = 0
+
+    def take(self, key: Hashable) -> Optional[str]:
+        """A ready item for `key`, or None (the caller then generates one itself)."""
+        self.set_key(key)
+        with self._lock:
+            self._failures = 0
+            if self._ready:
+                self.stats["hits"] += 1
+                return self._ready.popleft()
+            self.stats["misses"] += 1
+            return None
+
+    def fill(self, key: Hashable):
+        """Start background work until `pool_size` items are ready or being made."""
+        self.set_key(key)
+        with self._lock:
+            while len(self._ready) + self._pending < self.pool_size and self._failures < self.max_failures:
+                self._pending += 1
+                self._futures.append(self._executor.submit(self._work, key, self._generation))
+            self._futures = [f for f in self._futures if not f.done()]
+
+    def ready_count(self) -> int:
+        with self._lock:
+            return len(self._ready)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = dict(self.stats)
+            out["ready"] = len(self._ready)
+            out["pending"] = self._pending
+            times = sorted(self._produce_ms)
+        out["produce_p50_ms"] = times[len(times) // 2] if times else None
+        return out
+
+    def close(self):
+        with self._lock:
+            self._generation += 1
+            self._ready.clear()
+            self._futures = []
+            self._pending = 0
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _work(self, key: Hashable, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return  # the key changed while this job was queued
+        started = time.perf_counter()
+        try:
+            item = self.produce(key)
+            error = None
+        except Exception as e:
+            item, error = None, e
+        with self._lock:
+            if generation != self._generation:
+                if item:
+                    self.stats["discarded"] += 1
+                return
+            self._pending -= 1
+            if error is not None or not item:
+                self._failures += 1
+                self.stats["errors"] += 1
+                return
+            self._failures = 0
+            self._ready.append(item)
+            self.stats["produced"] += 1
+            self._produce_ms.append((time.perf_counter() - started) * 1000.0)
@@ -0,0 +1,11 @@
+from camera_pipeline import measure_preprocess_allocations
+
+
+def test_buffered_preprocess_allocates_far_less_than_legacy():
+    for face_size in (60, 240):
+        report = measure_preprocess_allocations(iterations=50, face_size=face_size)
+        buffered = report["buffered"]["median_bytes_per_frame"]
+        legacy = report["legacy"]["median_bytes_per_frame"]
+        assert buffered * 10 < legacy
+        # only numpy view headers remain; nothing that scales with the crop
+        assert buffered < 4096
@@ -0,0 +1,26 @@
+from crisis import DETECTOR, HELDOUT_PATH, LEGACY_KEYWORDS, _legacy_is_crisis, evaluate, load_corpus
+
+
+def test_corpus_precision_and_recall():
+    for label, text in load_corpus():
+        assert DETECTOR(text) == bool(label), text
+
+
+def test_heldout_recall_not_below_legacy():
+    heldout = load_corpus(HELDOUT_PATH)
+    assert evaluate(DETECTOR, heldout)["recall"] >= evaluate(_legacy_is_crisis, heldout)["recall"]
+
+
+def test_flags_everything_the_legacy_check_flagged():
+    # labelled-0 corpus lines are the legacy loop's known false positives ("want to diet")
+    texts = [text for label, text in load_corpus() if label]
+    texts += [f"lately {keyword} is how i feel" for keyword in LEGACY_KEYWORDS]
+    texts += ["I feel hopelessly lost", "suicidally depressed", "Hopelessness again", "SUICIDES in the news scare me"]
+    for text in texts:
+        if _legacy_is_crisis(text):
+            assert DETECTOR(text), text
+
+
+def test_long_context_without_anchor_is_not_flagged():
+    text = "Summary of the earlier conversation: the user said work was stressful. " * 40
+    assert not DETECTOR(text)
@@ -0,0 +1,23 @@
+from history import HistoryStore
+
+
+def test_conversations_are_isolated(tmp_path):
+    db = str(tmp_path / "history.db")
+    HistoryStore(db_path=db, conversation="alice").append("user", "alice secret")
+    HistoryStore(db_path=db, conversation="bob").append("user", "bob message")
+    carol = HistoryStore(db_path=db, conversation="carol")
+    assert len(carol) == 0
+    assert carol.recent(10) == []
+
+
+def test_two_stores_on_one_conversation_agree(tmp_path):
+    db = str(tmp_path / "history.db")
+    first = HistoryStore(db_path=db, conversation="c")
+    second = HistoryStore(db_path=db, conversation="c")
+    first.append("user", "one")
+    second.append("assistant", "two")
+    first.append("user", "three")
+    for store in (first, second):
+        assert len(store) == 3
+        assert [t.text for t in store.recent(3)] == ["one", "two", "three"]
+        assert [t.text for t in store[1:]] == ["two", "three"]
@@ -0,0 +1,27 @@
+import pytest
+
+from llm_cache import LLMResponseCache
+
+pytest.importorskip("sklearn")
+
+SYSTEM = "You are a calm companion."
+
+
+def test_near_duplicate_matches_across_history_with_near_scope():
+    cache = LLMResponseCache(near_duplicate=True, similarity=0.5)
+    first_turn = f"system: {SYSTEM}"
+    later_turn = first_turn + "\nuser: hi\nassistant: hello"
+    cache.store(first_turn, "mood: sad\nI can't sleep at night", "m", 0.7, "Try a wind-down routine.", near_scope=SYSTEM)
+
+    assert cache.lookup(later_turn, "mood: sad\nI cannot sleep at night", "m", 0.7) is None
+    assert cache.lookup(later_turn, "mood: sad\nI cannot sleep at night", "m", 0.7, near_scope=SYSTEM) == (
+        "Try a wind-down routine."
+    )
+    assert cache.stats["near_hits"] == 1
+
+
+def test_exact_hits_still_keyed_on_full_scope():
+    cache = LLMResponseCache()
+    cache.store("history a", "hello", "m", 0.7, "reply a", near_scope=SYSTEM)
+    assert cache.lookup("history b", "hello", "m", 0.7, near_scope=SYSTEM) is None
+    assert cache.lookup("history a", "hello", "m", 0.7, near_scope=SYSTEM) == "reply a"
@@ -0,0 +1,28 @@
+import threading
+import time
+
+from prefetch import Prefetcher
+
+
+def test_key_change_skips_queued_jobs_for_old_key():
+    calls = []
+    release = threading.Event()
+
+    def produce(key):
+        calls.append(key)
+        release.wait(2)
+        return f"joke for {key}"
+
+    prefetcher = Prefetcher(produce, pool_size=3)
+    prefetcher.fill("happy")
+    time.sleep(0.05)  # first "happy" job is running, two are queued
+    prefetcher.fill("sad")
+    release.set()
+    deadline = time.time() + 2
+    while prefetcher.ready_count() < 3 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert calls.count("happy") == 1
+    assert calls.count("sad") == 3
+    assert prefetcher.take("sad") == "joke for sad"
+    prefetcher.close()
@@ -0,0 +1,30 @@
+from redaction import Redactor, _legacy_anonymize
+
+
+def test_adjacent_dashed_phones_terminate_and_redact():
+    # two phones read as one Luhn-failing card number used to loop forever
+    text, counts = Redactor().redact("call 555-201-3344 555-201-3345 today")
+    assert text == "call [PHONE REDACTED] [PHONE REDACTED] today"
+    assert counts == {"PHONE": 2}
+
+
+def test_spaced_phones_not_swallowed_by_card_pattern():
+    text, counts = Redactor().redact("numbers: 555 201 3344 555 201 3345")
+    assert text == "numbers: [PHONE REDACTED] [PHONE REDACTED]"
+    assert counts == {"PHONE": 2}
+    legacy, _ = _legacy_anonymize("numbers: 555 201 3344 555 201 3345")
+    assert text == legacy
+
+
+def test_valid_card_still_redacted():
+    text, counts = Redactor().redact("Card 4111 1111 1111 1111 was charged.")
+    assert text == "Card [CREDIT CARD REDACTED] was charged."
+    assert counts == {"CREDIT_CARD": 1}
+
+
+def test_dates_split_by_whitespace_runs():
+    redactor = Redactor()
+    for text in ("Appointment on March  3, 2024", "met on Jun   12th", "seen on\nMarch\n3, 2024", "on May \t 4 again"):
+        redacted, counts = redactor.redact(text)
+        assert counts == {"DATE": 1}, text
+        assert "[DATE REDACTED]" in redacted
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Sentence-pipelined text-to-speech for streamed LLM replies.
+
+The app decides how the finished audio segments are played.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+
+# ---------- Sentence splitting ----------
+# End of sentence: . ! ? (optionally followed by closing quotes/brackets) then whitespace, or a blank line
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*\s+|\n\s*\n")
+_MARKDOWN = re.compile(r"[*_`#>]+")
+_BULLET = re.compile(r"^\s*(?:[-•]|\d+[.)])\s+", re.MULTILINE)
+
+
+def clean_for_speech(text: str) -> str:
+    """Drop markdown markers and list bullets so they aren't read aloud."""
+    text = _BULLET.sub("", text)
+    text = _MARKDOWN.sub("", text)
+    return " ".join(text.split())
+
+
+class SentenceSplitter:
+    """Accumulates streamed chunks and hands back complete sentences.
+
+    Sentences shorter than `min_chars` are merged with the next one so
+    abbreviations and "Hi!" don't become tiny, choppy TTS requests.
+    """
+
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self._buf = ""
+
+    def feed(self, chunk: str) -> list:
+        self._buf += chunk
+        out = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buf):
+            end = match.end()
+            if end - start < self.min_chars:
+                continue
+            out.append(self._buf[start:end])
+            start = end
+        self._buf = self._buf[start:]
+        return [s for s in (clean_for_speech(x) for x in out) if s]
+
+    def flush(self) -> list:
+        rest = clean_for_speech(self._buf)
+        self._buf = ""
+        return [rest] if rest else []
+
+
+# ---------- Ordered, bounded synthesis ----------
+class SpeechPipeline:
+    """Synthesises sentences as they complete, with at most `max_in_flight` TTS calls at once.
+
+    `ready()` returns finished audio segments strictly in sentence order
+    without blocking, so the caller can keep rendering the text stream.
+    """
+
+    def __init__(self, synthesize: Callable[[str], bytes], max_in_flight: int = 2, min_chars: int = 40):
+        self.synthesize = synthesize
+        self.max_in_flight = max(1, max_in_flight)
+        self.splitter = SentenceSplitter(min_chars=min_chars)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="emocare-tts")
+        self._waiting = deque()  # sentences not yet sent to TTS
+        self._futures = deque()  # in sentence order
+
+        self.started = time.perf_counter()
+        self.first_audio_at = None
+        self.sentences = 0
+        self.errors = []
+
+    def feed(self, chunk: str):
+        for sentence in self.splitter.feed(chunk):
+            self._waiting.append(sentence)
+            self.sentences += 1
+        self._dispatch()
+
+    def finish(self):
+        """Call once the text stream has ended."""
+        for sentence in self.splitter.flush():
+            self._waiting.append(sentence)
+            self.sentences += 1
+        self._dispatch()
+
+    def ready(self) -> list:
+        out = []
+        while self._futures and self._futures[0].done():
+            out.extend(self._take(self._futures.popleft()))
+        self._dispatch()
+        return out
+
+    def drain(self):
+        """Yield the remaining segments in order, waiting for each."""
+        while self._futures or self._waiting:
+            self._dispatch()
+            if not self._futures:
+                continue
+            future = self._futures.popleft()
+            wait((future,))
+            yield from self._take(future)
+
+    def close(self):
+        self._waiting.clear()
+        for future in self._futures:
+            future.cancel()
+        self._futures.clear()
+        self._executor.shutdown(wait=False)
+
+    def time_to_first_audio_ms(self) -> Optional[float]:
+        if self.first_audio_at is None:
+            return None
+        return (self.first_audio_at - self.started) * 1000.0
+
+    def _in_flight(self) -> int:
+        return sum(1 for f in self._futures if not f.done())
+
+    def _dispatch(self):
+        while self._waiting and self._in_flight() < self.max_in_flight:
+            self._futures.append(self._executor.submit(self.synthesize, self._waiting.popleft()))
+
+    def _take(self, future) -> list:
+        try:
+            audio = future.result()
+        except Exception as e:
+            self.errors.append(str(e))
+            return []
+        if not audio:
+            return []
+        if self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+        return [audio]
+
+
+# ---------- Content-addressed TTS cache ----------
+class TTSCache:
+    """Two-tier cache for synthesized audio, keyed by hash of (text, voice, model, format).
+
+    Memory tier is an LRU bounded by total bytes; the disk tier (optional)
+    is bounded by a size cap and evicts least-recently-used files (mtime
+    is refreshed on every hit). Concurrent requests for the same key wait
+    for the first one instead of synthesizing twice.
+    """
+
+    def __init__(self, directory: Optional[str] = None, memory_bytes: int = 32 * 1024 * 1024, disk_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._mem = OrderedDict()
+        self._mem_size = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bytes_served": 0,
+            "bytes_synthesized": 0,
+        }
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+        raw = json.dumps([text, voice_id, model_id, output_format], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_or_create(self, key: str, synthesize: Callable[[], bytes]) -> bytes:
+        while True:
+            with self._lock:
+                audio = self._mem_get(key)
+                if audio is not None:
+                    self.stats["memory_hits"] += 1
+                    self.stats["bytes_served"] += len(audio)
+                    return audio
+                pending = self._inflight.get(key)
+                if pending is None:
+                    pending = self._inflight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                pending.wait()
+                continue  # the owner either cached it or failed; look again
+            try:
+                audio = self._disk_get(key)
+                if audio is not None:
+                    with self._lock:
+                        self.stats["disk_hits"] += 1
+                        self.stats["bytes_served"] += len(audio)
+                        self._mem_put(key, audio)
+                    return audio
+
+                audio = synthesize()
+                if audio:
+                    with self._lock:
+                        self.stats["misses"] += 1
+                        self.stats["bytes_synthesized"] += len(audio)
+                        self._mem_put(key, audio)
+                    self._disk_put(key, audio)
+                return audio
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                pending.set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = dict(self.stats)
+            out["memory_entries"] = len(self._mem)
+            out["memory_mb"] = self._mem_size / (1024 * 1024)
+        lookups = out["memory_hits"] + out["disk_hits"] + out["misses"]
+        out["hit_rate"] = (out["memory_hits"] + out["disk_hits"]) / lookups if lookups else None
+        out["disk_mb"] = self._disk_usage() / (1024 * 1024) if self.directory else 0.0
+        return out
+
+    # ---- memory tier (call with lock held) ----
+    def _mem_get(self, key):
+        audio = self._mem.get(key)
+        if audio is not None:
+            self._mem.move_to_end(key)
+        return audio
+
+    def _mem_put(self, key, audio):
+        if len(audio) > self.memory_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_size -= len(old)
+        self._mem[key] = audio
+        self._mem_size += len(audio)
+        while self._mem_size > self.memory_bytes:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_size -= len(evicted)
+
+    # ---- disk tier ----
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".audio")
+
+    def _disk_get(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path, None)
+            return audio or None
+        except OSError:
+            return None
+
+    def _disk_put(self, key, audio):
+        if not self.directory or len(audio) > self.disk_bytes:
+            return
+        path = self._path(key)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(audio)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._disk_evict()
+
+    def _disk_entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".audio"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _disk_evict(self):
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.disk_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.disk_bytes:
+                break
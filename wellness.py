@@ -1,20 +1,18 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import cv2
 import time
 from cProfile import label
 import streamlit as st
 import os
 import re
-import textwrap
+import hashlib
+import io
+import uuid
 from datetime import datetime
 from typing import Optional
 
 from dotenv import load_dotenv
-from groq import Groq
-import PyPDF2
-import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
 import numpy as np
@@ -40,6 +38,30 @@ try:
 except ImportError:
     ElevenLabs = None
 
+from camera_pipeline import (
+    EMOTION_TO_MOOD,
+    CameraEngine,
+    DebugCapture,
+    FrameGrabber,
+    ModelRegistry,
+    benchmark_batching,
+    format_capture_stats,
+    format_engine_stats,
+    format_model_diagnostics,
+    format_tracker_stats,
+    measure_preprocess_allocations,
+)
+from conversation import ContextWindow
+from crisis import is_crisis_message
+from history import HistoryStore
+from journal import MAX_JOURNAL_CHARS, MAX_PDF_PAGES, JournalStore, estimate_tokens, process_journal
+from llm_backends import create_client, load_llm_config
+from llm_cache import LLMResponseCache
+from llm_gateway import LLMError, LLMGateway, format_gateway_stats
+from prefetch import Prefetcher
+from redaction import Redactor, labelled_counts
+from tts_pipeline import SpeechPipeline, TTSCache
+
 
 # ------------------ Mood -> Music Recommendations ------------------
 MOOD_MUSIC = {
@@ -232,30 +254,26 @@ def run_calm_quest():
                     "3) One gentle reflective question\n"
                 )
 
-                with st.spinner("EmoCare is reflecting on your Calm Quest..."):
-                    response_text, _ = get_wellness_response(
-                        recap,
-                        st.session_state.focus_area,
-                        st.session_state.current_mood,
-                        journal_text=st.session_state.uploaded_pdf_text,
+                with st.chat_message("assistant"):
+                    response_text = st.write_stream(
+                        stream_with_speech(
+                            stream_wellness_response(
+                                recap,
+                                st.session_state.focus_area,
+                                st.session_state.current_mood,
+                                journal_text=st.session_state.uploaded_pdf_text,
+                                journal_index=st.session_state.journal_index,
+                                label="calm_quest",
+                                history=st.session_state.conversation_history,
+                            ),
+                        )
                     )
 
+                st.session_state.conversation_history.append("user", "🎮 Completed Calm Quest")
                 st.session_state.conversation_history.append(
-                    {"role": "user", "text": "🎮 Completed Calm Quest", "timestamp": datetime.now().isoformat()}
+                    "assistant", response_text, used_pdf=bool(st.session_state.uploaded_pdf_text)
                 )
-                st.session_state.conversation_history.append(
-                    {
-                        "role": "assistant",
-                        "text": response_text,
-                        "timestamp": datetime.now().isoformat(),
-                        "used_pdf": bool(st.session_state.uploaded_pdf_text),
-                    }
-                )
-
-                if st.session_state.use_tts and elevenlabs_client:
-                    audio_bytes = elevenlabs_tts_bytes(response_text)
-                    if audio_bytes:
-                        st.audio(audio_bytes, format="audio/mp3")
+                compact_conversation()
 
                 st.session_state.calm_quest_active = False
                 st.session_state.calm_quest_step = 0
@@ -267,8 +285,8 @@ def run_calm_quest():
 
 
 # ---------- Joke generator ----------
-def get_funny_joke(mood: str, avatar: str) -> str:
-    system_prompt = f"""
+def joke_system_prompt(mood: str, avatar: str) -> str:
+    return f"""
 You are EmoCare, a friendly wellness companion.
 Generate ONE short, genuinely funny, wholesome joke (max 2 lines).
 No dark humor. No insults. No politics. No religion. No self-harm references.
@@ -282,8 +300,37 @@ Style:
 User mood: {mood}
 Avatar: {avatar}
 """
-    joke = getTextLLM_system(system_prompt, "Tell me a joke.")
-    return (joke or "").strip()
+
+
+def stream_funny_joke(mood: str, avatar: str):
+    system_prompt = joke_system_prompt(mood, avatar)
+    # Jokes are only cached when the user opts into a variety pool; otherwise always fresh
+    variety = st.session_state.joke_variety
+    yield from streamTextLLM_system(system_prompt, "Tell me a joke.", label="joke", cache_pool=variety or None)
+
+
+def prefetch_joke(key) -> str:
+    """Background producer for the joke Prefetcher; key is (mood, avatar, speak).
+
+    Runs on a worker thread, so no Streamlit calls. Coalescing is off so
+    every prefetch is a separate joke. With `speak`, the audio is made now
+    and lands in the shared TTS cache, so playing it later is instant.
+    """
+    mood, avatar, speak = key
+    route = llm_config.route("joke")
+    messages = [
+        {"role": "system", "content": joke_system_prompt(mood, avatar)},
+        {"role": "user", "content": "Tell me a joke."},
+    ]
+    joke = llm_gateway.complete(
+        messages, model=route.model, temperature=route.temperature, max_tokens=route.max_tokens, coalesce=False
+    ).strip()
+    if joke and speak:
+        try:
+            elevenlabs_tts_convert(joke)
+        except Exception:
+            pass  # the joke is still fine; audio is made on demand instead
+    return joke
 
 
 # ---------- EmoCare avatar & theme config ----------
@@ -308,8 +355,19 @@ load_css()
 
 # ---------- ENV & CLIENTS ----------
 load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-groq_client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+llm_config = load_llm_config()
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_gateway() -> Optional[LLMGateway]:
+    # One async client (pooled connections) and one concurrency limit for all sessions
+    client = create_client(llm_config)
+    if client is None:
+        return None
+    return LLMGateway(client, max_concurrency=int(os.getenv("EMOCARE_LLM_CONCURRENCY", "4")))
+
+
+llm_gateway = get_llm_gateway()
 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 
@@ -322,38 +380,142 @@ if ELEVENLABS_API_KEY and ElevenLabs:
         elevenlabs_client = None
 
 
+# ---------- Camera models (shared across sessions) ----------
+@st.cache_resource(show_spinner=False)
+def get_model_registry() -> ModelRegistry:
+    return ModelRegistry()
+
+
 # ---------- LLM helpers ----------
-def getTextLLM_system(system_prompt, user_text):
-    if not groq_client:
-        return "LLM Error: GROQ_API_KEY is not configured."
-    try:
+def record_llm_timing(
+    label: str, started: float, first_token: Optional[float], chars: int, prompt_tokens=None, error=None
+):
+    """Keep the last few time-to-first-token / total latency measurements for the UI."""
+    done = time.perf_counter()
+    timings = st.session_state.setdefault("llm_timings", [])
+    timings.append({
+        "task": label,
+        "ttft_ms": round((first_token - started) * 1000) if first_token else None,
+        "total_ms": round((done - started) * 1000),
+        "prompt_tokens": prompt_tokens,
+        "chars": chars,
+        "error": error,
+        "at": datetime.now().strftime("%H:%M:%S"),
+    })
+    del timings[:-20]
+
+
+# Shown instead of raw exception text when the gateway gives up
+LLM_ERROR_REPLIES = {
+    "rate_limited": "I'm getting a lot of requests right now. Please try again in a few seconds. 💜",
+    "timeout": "Sorry, that took too long on my side. Could you send your message again?",
+    "unavailable": "I can't reach my language model at the moment. Please try again shortly.",
+    "error": "Sorry, something went wrong while writing a reply. Please try again.",
+}
+
+
+def streamTextLLM_system(system_prompt, user_text, label="chat", cache_pool=1, history=None):
+    """Yield the reply in chunks as the LLM streams them (works with st.write_stream).
+
+    Replies go through the session's response cache; `cache_pool=None`
+    bypasses it, and a pool > 1 rotates through that many cached replies.
+    Crisis messages always bypass the cache. With `history`, earlier turns
+    are included through the session's token-budgeted context window.
+    `label` also picks the model route (see llm_backends).
+    """
+    route = llm_config.route(label)
+    if history:
+        messages, context_stats = st.session_state.context_window.build(system_prompt, history, user_text)
+    else:
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_text},
         ]
-        completion = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.7,
-            max_completion_tokens=1500,
+        context_stats = None
+    prompt_tokens = context_stats["prompt_tokens"] if context_stats else sum(
+        estimate_tokens(m["content"]) + 4 for m in messages
+    )
+    # the reply depends on everything before the user message, so that is the cache scope;
+    # near-duplicate matching ignores the history (mood and focus are in user_text)
+    cache_scope = "\n".join(f"{m['role']}: {m['content']}" for m in messages[:-1])
+
+    cache = st.session_state.llm_cache
+    use_cache = bool(cache_pool) and not is_crisis_message(user_text or "")
+    if use_cache:
+        cached = cache.lookup(
+            cache_scope, user_text, route.model, route.temperature, pool_size=cache_pool, near_scope=system_prompt
         )
-        return completion.choices[0].message.content
-    except Exception as e:
-        return f"LLM Error: Could not generate response. ({e})"
+        if cached is not None:
+            now = time.perf_counter()
+            record_llm_timing(f"{label} (cached)", now, now, len(cached))
+            yield cached
+            return
+    else:
+        cache.note_bypass()
 
+    if not llm_gateway:
+        yield "LLM Error: GROQ_API_KEY is not configured (or set EMOCARE_LLM_BACKEND=openai for a local model)."
+        return
 
-# ---------- Crisis detection & Core wellness response ----------
-CRISIS_KEYWORDS = [
-    "kill myself", "end my life", "suicidal", "suicide", "don't want to live",
-    "want to die", "self harm", "ending it all", "can't go on", "hopeless",
-]
+    started = time.perf_counter()
+    first_token = None
+    parts = []
+    failed = None
+    try:
+        for delta in llm_gateway.stream(
+            messages, model=route.model, temperature=route.temperature, max_tokens=route.max_tokens
+        ):
+            if first_token is None:
+                first_token = time.perf_counter()
+            parts.append(delta)
+            yield delta
+    except LLMError as e:
+        failed = e.kind
+        yield ("\n\n" if parts else "") + LLM_ERROR_REPLIES.get(e.kind, LLM_ERROR_REPLIES["error"])
+    finally:
+        record_llm_timing(label, started, first_token, sum(len(p) for p in parts), prompt_tokens, error=failed)
+
+    if use_cache and not failed and parts:
+        cache.store(
+            cache_scope, user_text, route.model, route.temperature, "".join(parts),
+            pool_size=cache_pool, near_scope=system_prompt,
+        )
+
+
+def compact_conversation():
+    """Fold turns that left the verbatim window into the rolling summary.
 
-def is_crisis_message(text: str) -> bool:
-    if not text:
-        return False
-    text_lower = text.lower()
-    return any(keyword in text_lower for keyword in CRISIS_KEYWORDS)
+    Runs after the reply has been shown, so the summary call never adds to
+    time-to-first-token.
+    """
+    summarize = summarize_with_llm if llm_gateway else None
+    st.session_state.context_window.compact(st.session_state.conversation_history, summarize=summarize)
 
+
+def summarize_with_llm(system_prompt: str, text: str) -> str:
+    # Raises LLMError on failure so the caller can fall back to an extractive summary
+    started = time.perf_counter()
+    messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": text}]
+    route = llm_config.route("summary")
+    summary = llm_gateway.complete(
+        messages, model=route.model, temperature=route.temperature, max_tokens=route.max_tokens
+    )
+    record_llm_timing("summary", started, None, len(summary))
+    return summary
+
+
+def write_stream_to(placeholder, chunks, render=None) -> str:
+    """Render a chunk stream into a placeholder as it arrives; return the full text."""
+    render = render or placeholder.markdown
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        render(text + "▌")
+    render(text)
+    return text
+
+
+# ---------- Crisis detection & Core wellness response ----------
 def build_crisis_response():
     return (
         "I'm really glad you reached out and shared this with me. "
@@ -364,12 +526,25 @@ def build_crisis_response():
         "Your safety and wellbeing are important. 💜"
     )
 
-def get_wellness_response(user_text, focus_area, mood, journal_text=None):
+def stream_wellness_response(
+    user_text, focus_area, mood, journal_text=None, label="chat", journal_index=None, history=None
+):
+    """Yield the wellness reply in chunks (crisis replies are yielded in one piece).
+
+    With a `journal_index`, the journal excerpts most relevant to this
+    message are included (within a token budget) instead of a fixed snippet.
+    `history` is the conversation so far, excluding this message.
+    """
     if is_crisis_message(user_text or ""):
-        return build_crisis_response(), []
+        yield build_crisis_response()
+        return
 
     context = f"User's chosen focus area: {focus_area}\nUser's current mood: {mood}\n\n"
-    if journal_text:
+    if journal_index is not None:
+        excerpts = journal_index.context_for(user_text, k=JOURNAL_TOP_K, token_budget=JOURNAL_TOKEN_BUDGET)
+        if excerpts:
+            context += f"The user has also shared a journal. Excerpts relevant to this message:\n{excerpts}\n\n"
+    elif journal_text:
         context += f"The user has also shared some journal text. Snippet:\n{journal_text[:400]}\n\n"
 
     system_prompt = """
@@ -401,60 +576,86 @@ Tone & style:
 """
 
     user_input = context + user_text
-    response = getTextLLM_system(system_prompt, user_input)
-    return response, []
+    yield from streamTextLLM_system(system_prompt, user_input, label=label, history=history)
 
 
 # ---------- PDF processing helpers ----------
-def extract_text_from_pdf(file) -> str:
-    try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = "".join(page.extract_text() or "" for page in pdf_reader.pages)
-        return text
-    except Exception as e:
-        st.error(f"Error reading PDF: {str(e)}")
-        return ""
+JOURNAL_TOP_K = 4
+JOURNAL_TOKEN_BUDGET = 600
 
-def anonymize_text(text: str):
-    redactions_made = []
-    redacted_text = re.sub(
-        r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
-        "[EMAIL REDACTED]",
-        text,
-    )
-    if redacted_text != text:
-        redactions_made.append("Email Addresses")
 
-    new_text = re.sub(
-        r"\b(?:\+?1[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b",
-        "[PHONE REDACTED]",
-        redacted_text,
-    )
-    if new_text != redacted_text:
-        redactions_made.append("Phone Numbers")
-    redacted_text = new_text
+@st.cache_resource(show_spinner=False)
+def get_journal_store() -> JournalStore:
+    # Processed uploads keyed on content hash, so reruns don't re-parse the PDF
+    return JournalStore(max_entries=8)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_redactor(names: tuple = ()) -> Redactor:
+    return Redactor(names=names)
 
-    return redacted_text, redactions_made
+def anonymize_text(text: str, names: tuple = ()):
+    """Redact PII in one pass; returns (text, {"Email Addresses": n, ...})."""
+    redacted_text, counts = get_redactor(names).redact(text)
+    return redacted_text, labelled_counts(counts)
 
-def generate_wordcloud(text: str):
+def render_wordcloud_png(text: str) -> Optional[bytes]:
+    """Word cloud as PNG bytes, or None if there aren't enough meaningful words."""
+    words = [
+        w
+        for w in re.findall(r"\b\w+\b", text.lower())
+        if w not in ENGLISH_STOP_WORDS and len(w) > 2
+    ]
+    processed_text = " ".join(words)
+    if not processed_text.strip():
+        return None
+    wc = WordCloud(width=800, height=400, background_color="white").generate(processed_text)
+    buf = io.BytesIO()
+    wc.to_image().save(buf, format="PNG")
+    return buf.getvalue()
+
+def generate_wordcloud(text: str, png: Optional[bytes] = None):
     try:
-        words = [
-            w
-            for w in re.findall(r"\b\w+\b", text.lower())
-            if w not in ENGLISH_STOP_WORDS and len(w) > 2
-        ]
-        processed_text = " ".join(words)
-        if not processed_text.strip():
+        if png is None:
+            png = render_wordcloud_png(text)
+        if png is None:
             st.info("Not enough meaningful words to generate a word cloud yet.")
             return
-        wc = WordCloud(width=800, height=400, background_color="white").generate(processed_text)
-        fig, ax = plt.subplots(figsize=(8, 4))
-        ax.imshow(wc, interpolation="bilinear")
-        ax.axis("off")
-        st.pyplot(fig)
+        st.image(png, use_container_width=True)
     except Exception as e:
         st.error(f"Error generating word cloud: {str(e)}")
 
+def load_journal_pdf(pdf_bytes: bytes, redact_names: tuple = ()) -> dict:
+    """Processed journal for these bytes, from the store or extracted page by page with a progress bar."""
+    file_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    store_key = file_hash + "|" + "|".join(redact_names)
+    store = get_journal_store()
+    journal = store.get(store_key)
+    if journal is not None:
+        return journal
+
+    progress = st.progress(0.0, text="Reading your journal...")
+
+    def on_progress(done, total):
+        progress.progress(done / max(1, total), text=f"Reading your journal... page {done}/{total}")
+
+    try:
+        journal = process_journal(
+            pdf_bytes,
+            redact=lambda text: anonymize_text(text, redact_names),
+            on_progress=on_progress,
+            # Serial unless EMOCARE_PDF_WORKERS > 1 (spawned process pool; helps very long PDFs on multi-core hosts)
+            workers=int(os.getenv("EMOCARE_PDF_WORKERS", "1")),
+        )
+    finally:
+        progress.empty()
+    try:
+        journal["wordcloud_png"] = render_wordcloud_png(journal["text"])
+    except Exception:
+        journal["wordcloud_png"] = None
+    store.put(store_key, journal)
+    return journal
+
 
 # ---------- AUDIO HELPERS (voice mode) ----------
 def record_voice_to_wav(seconds: int = 10, sample_rate: int = 16000) -> Optional[str]:
@@ -527,6 +728,39 @@ def elevenlabs_stt(wav_path: str) -> str:
         return ""
 
 
+TTS_VOICE_ID = "pNInz6obpgDQGcFmaJgB"
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+
+
+@st.cache_resource(show_spinner=False)
+def get_tts_cache() -> TTSCache:
+    # Shared by all sessions; memory only unless EMOCARE_TTS_CACHE_DIR opts in to a disk tier,
+    # since the clips are the user's own replies read aloud
+    return TTSCache(os.getenv("EMOCARE_TTS_CACHE_DIR") or None)
+
+
+tts_cache = get_tts_cache()
+
+
+def elevenlabs_tts_convert(text: str) -> bytes:
+    """ElevenLabs call (through the TTS cache) with no Streamlit calls, so it can run on worker threads."""
+    def synthesize():
+        audio_result = elevenlabs_client.text_to_speech.convert(
+            text=text,
+            voice_id=TTS_VOICE_ID,
+            model_id=TTS_MODEL_ID,
+            output_format=TTS_OUTPUT_FORMAT,
+        )
+
+        if isinstance(audio_result, bytes):
+            return audio_result
+        return b"".join(chunk for chunk in audio_result)
+
+    key = TTSCache.key(text, TTS_VOICE_ID, TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+    return tts_cache.get_or_create(key, synthesize)
+
+
 def elevenlabs_tts_bytes(text: str) -> bytes:
     if not elevenlabs_client:
         st.warning("TTS not configured (ElevenLabs client unavailable).")
@@ -536,17 +770,7 @@ def elevenlabs_tts_bytes(text: str) -> bytes:
         return b""
 
     try:
-        audio_result = elevenlabs_client.text_to_speech.convert(
-            text=text,
-            voice_id="pNInz6obpgDQGcFmaJgB",
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128",
-        )
-
-        if isinstance(audio_result, bytes):
-            audio_bytes = audio_result
-        else:
-            audio_bytes = b"".join(chunk for chunk in audio_result)
+        audio_bytes = elevenlabs_tts_convert(text)
 
         if not audio_bytes:
             st.warning("TTS returned empty audio.")
@@ -561,13 +785,80 @@ def elevenlabs_tts_bytes(text: str) -> bytes:
         return b""
 
 
+def stream_with_speech(chunks):
+    """Pass text chunks through unchanged while synthesizing each sentence as soon as it's complete.
+
+    Segments are joined in sentence order into st.session_state.last_reply_audio,
+    which the history view autoplays once as a single clip after the rerun
+    that follows every reply (players inside the streamed bubble would be
+    removed by that rerun mid-sentence). Because sentences are synthesized
+    while the LLM is still writing, the audio is ready when the text is.
+    """
+    st.session_state.last_reply_audio = None
+    st.session_state.last_reply_autoplay = False
+    if not (st.session_state.use_tts and elevenlabs_client):
+        yield from chunks
+        return
+
+    pipeline = SpeechPipeline(elevenlabs_tts_convert, max_in_flight=2)
+    segments = []
+
+    try:
+        for chunk in chunks:
+            pipeline.feed(chunk)
+            segments.extend(pipeline.ready())
+            yield chunk
+        pipeline.finish()
+        segments.extend(pipeline.drain())
+    finally:
+        pipeline.close()
+
+    if pipeline.errors:
+        st.warning(f"TTS error: {pipeline.errors[0]}")
+    if segments:
+        # MP3 frames concatenate cleanly, so the segments play in order as one clip
+        st.session_state.last_reply_audio = b"".join(segments)
+        st.session_state.last_reply_autoplay = True
+    # "ttft" for this row is time to first audio segment
+    record_llm_timing("tts", pipeline.started, pipeline.first_audio_at, sum(len(a) for a in segments))
+
+
 # ---------- Session state init ----------
+HISTORY_PAGE = 20
+
+
+def conversation_id() -> str:
+    """Per-browser conversation key, kept in the URL (?conversation=...) so a reload resumes it."""
+    cid = st.query_params.get("conversation", "")
+    if not re.fullmatch(r"[A-Za-z0-9_-]{16,64}", cid or ""):
+        cid = uuid.uuid4().hex
+        st.query_params["conversation"] = cid
+    return cid
+
+
 if "conversation_history" not in st.session_state:
-    st.session_state.conversation_history = []
+    # Set EMOCARE_HISTORY_DB to a SQLite file to keep conversations across restarts.
+    # Each browser session gets its own conversation ID, so sessions never see each other's turns.
+    st.session_state.conversation_history = HistoryStore(
+        db_path=os.getenv("EMOCARE_HISTORY_DB") or None,
+        conversation=conversation_id(),
+    )
+if "history_visible" not in st.session_state:
+    st.session_state.history_visible = HISTORY_PAGE
+if "context_window" not in st.session_state:
+    st.session_state.context_window = ContextWindow()
+if "context_budget" not in st.session_state:
+    st.session_state.context_budget = 1500
+if "context_keep_turns" not in st.session_state:
+    st.session_state.context_keep_turns = 3
+st.session_state.context_window.budget_tokens = st.session_state.context_budget
+st.session_state.context_window.keep_turns = st.session_state.context_keep_turns
 if "uploaded_pdf_text" not in st.session_state:
     st.session_state.uploaded_pdf_text = None
 if "pdf_filename" not in st.session_state:
     st.session_state.pdf_filename = None
+if "journal_index" not in st.session_state:
+    st.session_state.journal_index = None
 if "focus_area" not in st.session_state:
     st.session_state.focus_area = "General Check-in"
 if "current_mood" not in st.session_state:
@@ -604,6 +895,22 @@ if "audio_output_device" not in st.session_state:
     st.session_state.audio_output_device = None
 if "audio_applied" not in st.session_state:
     st.session_state.audio_applied = False
+if "last_reply_audio" not in st.session_state:
+    st.session_state.last_reply_audio = None
+if "last_reply_autoplay" not in st.session_state:
+    st.session_state.last_reply_autoplay = False
+if "llm_cache" not in st.session_state:
+    st.session_state.llm_cache = LLMResponseCache()
+if "llm_cache_near_dup" not in st.session_state:
+    st.session_state.llm_cache_near_dup = False
+if "joke_variety" not in st.session_state:
+    st.session_state.joke_variety = 0
+if "joke_prefetch" not in st.session_state:
+    st.session_state.joke_prefetch = 1
+if "joke_prefetcher" not in st.session_state:
+    st.session_state.joke_prefetcher = Prefetcher(prefetch_joke)
+if "llm_timings" not in st.session_state:
+    st.session_state.llm_timings = []
 if "camera_on" not in st.session_state:
     st.session_state.camera_on = False
 if "frame_count" not in st.session_state:
@@ -612,6 +919,20 @@ if "last_emotion" not in st.session_state:
     st.session_state.last_emotion = None
 if "last_conf" not in st.session_state:
     st.session_state.last_conf = 0.0
+if "suggested_mood" not in st.session_state:
+    st.session_state.suggested_mood = None
+if "det_width" not in st.session_state:
+    st.session_state.det_width = 320
+if "preview_quality" not in st.session_state:
+    st.session_state.preview_quality = 75
+if "preview_fps" not in st.session_state:
+    st.session_state.preview_fps = 12
+if "debug_capture_on" not in st.session_state:
+    st.session_state.debug_capture_on = False
+if "debug_capture_dir" not in st.session_state:
+    st.session_state.debug_capture_dir = ""
+if "debug_capture" not in st.session_state:
+    st.session_state.debug_capture = None
 
 
 # ---------- SIDEBAR ----------
@@ -640,17 +961,19 @@ with st.sidebar:
         ],
     )
 
+    mood_options = [
+        "Neutral",
+        "Happy / Excited",
+        "Calm / Okay",
+        "Stressed / Overwhelmed",
+        "Sad / Low",
+        "Angry / Frustrated",
+        "Lonely / Disconnected",
+    ]
     st.session_state.current_mood = st.selectbox(
         "How are you feeling right now?",
-        [
-            "Neutral",
-            "Happy / Excited",
-            "Calm / Okay",
-            "Stressed / Overwhelmed",
-            "Sad / Low",
-            "Angry / Frustrated",
-            "Lonely / Disconnected",
-        ],
+        mood_options,
+        index=mood_options.index(st.session_state.current_mood),
     )
 
     st.markdown("---")
@@ -662,24 +985,46 @@ with st.sidebar:
         "Upload a personal journal/notes (PDF only) for context.", type=["pdf"]
     )
 
+    redact_names_raw = st.text_input(
+        "Names to hide from the journal (comma-separated, optional)",
+        key="redact_names",
+    )
+    redact_names = tuple(sorted({n.strip() for n in redact_names_raw.split(",") if n.strip()}))
+
     if uploaded_pdf is not None:
         try:
-            raw_text = extract_text_from_pdf(uploaded_pdf)
-            anon_text, redactions = anonymize_text(raw_text)
+            journal = load_journal_pdf(uploaded_pdf.getvalue(), redact_names)
+            anon_text, redactions = journal["text"], journal["redactions"]
             st.session_state.uploaded_pdf_text = anon_text
             st.session_state.pdf_filename = uploaded_pdf.name
+            st.session_state.journal_index = journal["index"]
 
             st.success(f"Loaded PDF: {uploaded_pdf.name}")
+            if journal["truncated"]:
+                st.warning(
+                    f"Only the first {journal['pages_read']} of {journal['pages_total']} pages were used "
+                    f"(limits: {MAX_PDF_PAGES} pages, {MAX_JOURNAL_CHARS:,} characters)."
+                )
+            index = st.session_state.journal_index
+            if len(index):
+                note = (
+                    f"{journal['pages_read']} pages read in {journal['extract_ms']:.0f} ms · "
+                    f"indexed {len(index)} chunks in {index.build_ms:.0f} ms"
+                )
+                if index.last_query_ms is not None:
+                    note += f" · last retrieval {index.last_query_ms:.1f} ms"
+                st.caption(note)
             if redactions:
-                st.info("Redactions made: " + ", ".join(redactions))
+                st.info("Redactions made: " + ", ".join(f"{label} ({n})" for label, n in redactions.items()))
 
             with st.expander("☁️ Word Cloud from your journal"):
-                generate_wordcloud(anon_text)
+                generate_wordcloud(anon_text, png=journal["wordcloud_png"])
         except Exception as e:
             st.error(f"Error processing PDF: {str(e)}")
     else:
         st.session_state.uploaded_pdf_text = None
         st.session_state.pdf_filename = None
+        st.session_state.journal_index = None
 
 
 # ================== MAIN CONTENT: CENTER + RIGHT PANEL ==================
@@ -724,15 +1069,35 @@ with center_col:
 
     # ---- Quick Laugh ----
     st.markdown("#### 😂 Quick Laugh")
-    if st.button("Hear a funny joke", use_container_width=True, key="joke_button"):
-        with st.spinner("Finding something funny..."):
-            st.session_state.last_joke = get_funny_joke(
-                st.session_state.current_mood,
-                st.session_state.selected_avatar,
+    joke_clicked = st.button("Hear a funny joke", use_container_width=True, key="joke_button")
+    joke_slot = st.empty()
+    # Jokes are prefetched per mood/companion (and voice setting); a change drops the ready ones
+    joke_key = (
+        st.session_state.current_mood,
+        st.session_state.selected_avatar,
+        bool(st.session_state.use_tts and elevenlabs_client),
+    )
+    joke_prefetcher = st.session_state.joke_prefetcher
+    joke_prefetcher.pool_size = st.session_state.joke_prefetch if llm_gateway else 0
+    if joke_clicked:
+        started = time.perf_counter()
+        joke = joke_prefetcher.take(joke_key) if joke_prefetcher.pool_size else None
+        if joke is not None:
+            record_llm_timing("joke (prefetched)", started, started, len(joke))
+        else:
+            joke = write_stream_to(
+                joke_slot,
+                stream_funny_joke(
+                    st.session_state.current_mood,
+                    st.session_state.selected_avatar,
+                ),
+                render=joke_slot.success,
             )
+        st.session_state.last_joke = joke.strip()
+    joke_prefetcher.fill(joke_key)
 
     if st.session_state.last_joke:
-        st.success(st.session_state.last_joke)
+        joke_slot.success(st.session_state.last_joke)
 
         if st.session_state.use_tts and elevenlabs_client:
             audio_bytes = elevenlabs_tts_bytes(st.session_state.last_joke)
@@ -756,158 +1121,180 @@ with center_col:
     frame_placeholder = st.empty()
     status_placeholder = st.empty()
 
+    registry = get_model_registry()
+
     if st.session_state.camera_on:
-        yunet_path = "models/face_detection_yunet_2023mar.onnx"
-        emotion_model_path = "models/emotion-ferplus-8.onnx"
-
-        if not os.path.exists(yunet_path):
-            st.error(f"YuNet model file not found: {yunet_path}")
-            st.info("Place the file at: models/face_detection_yunet_2023mar.onnx")
-        elif not os.path.exists(emotion_model_path):
-            st.error(f"Emotion model file not found: {emotion_model_path}")
-            st.info("Place the file at: models/emotion-ferplus-8.onnx")
+        missing = registry.missing_files()
+
+        if registry.yunet_path in missing:
+            st.error(f"YuNet model file not found: {registry.yunet_path}")
+            st.info(f"Place the file at: {registry.yunet_path}")
+        elif registry.emotion_model_path in missing:
+            st.error(f"Emotion model file not found: {registry.emotion_model_path}")
+            st.info(f"Place the file at: {registry.emotion_model_path}")
         else:
-            # Use V4L2 backend (often more reliable on Jetson for USB webcams)
-            cap = cv2.VideoCapture(0, cv2.CAP_V4L2)
-
-            # Reduce load for smoother preview
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
-            # Ask webcam for MJPG (often faster)
-            try:
-                cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
-            except Exception:
-                pass
-
-            # Reduce buffering lag (not supported on all builds, safe to try)
-            try:
-                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            except Exception:
-                pass
-
-            if not cap.isOpened():
+            # Loaded + warmed once per process, reused by every session
+            with st.spinner("Loading face & emotion models..."):
+                registry.detector()
+                registry.emotion_net()
+
+            # Dedicated thread owns the V4L2 capture; we only ever see the newest frame
+            grabber = FrameGrabber(0)
+
+            if not grabber.start():
                 st.error("Could not open webcam. Check Docker device access (/dev/video0).")
             else:
-                detector = cv2.FaceDetectorYN.create(
-                    yunet_path, "",
-                    (320, 320),
-                    score_threshold=0.7,
-                    nms_threshold=0.3,
-                    top_k=5000
+                # Debug capture is opt-in; the default path does no per-frame file I/O
+                debug_capture = None
+                if st.session_state.debug_capture_on:
+                    debug_capture = DebugCapture(st.session_state.debug_capture_dir.strip() or None)
+                st.session_state.debug_capture = debug_capture
+
+                # detect -> crop -> classify -> annotate lives in CameraEngine (also used by the offline bench)
+                engine = CameraEngine(
+                    registry,
+                    det_width=st.session_state.det_width,
+                    redetect_every=5,
+                    target_fps=15.0,
+                    preview_quality=st.session_state.preview_quality,
+                    preview_fps=st.session_state.preview_fps,
+                    debug=debug_capture,
                 )
-
-                # Emotion model (FER+)
-                emotion_net = cv2.dnn.readNetFromONNX(emotion_model_path)
-                emotion_labels = [
-                    "neutral",
-                    "happiness",
-                    "surprise",
-                    "sadness",
-                    "anger",
-                    "disgust",
-                    "fear",
-                    "contempt"
-                ]
+                engine.start()
+                st.session_state.last_emotion = None
 
                 start_time = time.time()
                 status_placeholder.info("Camera running for 10 seconds...")
 
+                last_seq = 0
                 while st.session_state.camera_on and (time.time() - start_time < 10):
-                    ret, frame = cap.read()
-                    if not ret or frame is None:
-                        st.warning("Failed to read frame from webcam.")
+                    latest = grabber.wait_latest(last_seq, timeout=1.0)
+                    if latest is None:
+                        st.warning(grabber.error or "Failed to read frame from webcam.")
                         break
+                    last_seq, raw_frame = latest
 
                     # Always increment frame count
                     st.session_state.frame_count += 1
-                    do_emotion = (st.session_state.frame_count % 5 == 0)  # every 5th frame
-
-                    # --- Face detection (always) ---
-                    h, w = frame.shape[:2]
-                    detector.setInputSize((w, h))
-                    _, faces = detector.detect(frame)
-
-                    # Draw face boxes (always, if any)
-                    best_face = None  # (x,y,bw,bh) of largest face
-                    if faces is not None:
-                        boxes = [tuple(map(int, f[:4])) for f in faces]
-                        for (x, y, bw, bh) in boxes:
-                            cv2.rectangle(frame, (x, y), (x + bw, y + bh), (0, 255, 0), 2)
-
-                        best_face = max(boxes, key=lambda b: b[2] * b[3])
-
-                    # --- Emotion inference (throttled) ---
-                    detected_emotion = None
-                    emotion_conf = 0.0
-
-                    if do_emotion and best_face is not None:
-                        x, y, bw, bh = best_face
-
-                        # Clamp crop area
-                        x0 = max(0, x)
-                        y0 = max(0, y)
-                        x1 = min(w, x + bw)
-                        y1 = min(h, y + bh)
-
-                        face = frame[y0:y1, x0:x1]
-                        if face.size > 0:
-                            gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
-                            cv2.imwrite("temp_full_face.jpg", gray)
-                            gray = cv2.resize(gray, (64, 64))
-                            cv2.imwrite("temp_cropped_face.jpg", gray)
-                            
-                            print("min/max range:", np.min(gray), np.max(gray))
-                            blob = gray.astype("float32").reshape(1, 1, 64, 64)
-                            
-                            
-                            emotion_net.setInput(blob)
-                            scores = emotion_net.forward().reshape(-1)
-
-                            # softmax
-                            exp = np.exp(scores - np.max(scores))
-                            probs = exp / exp.sum()
-
-                            idx = int(np.argmax(probs))
-                            detected_emotion = emotion_labels[idx]
-                            emotion_conf = float(probs[idx])
-
-                            # store last known emotion so UI can display even between inference frames
-                            st.session_state.last_emotion = detected_emotion
-                            st.session_state.last_conf = emotion_conf
-
-                    # Put emotion label (always show last known)
-                    if st.session_state.last_emotion:
-                        label_txt = f"{st.session_state.last_emotion} ({st.session_state.last_conf:.2f})"
-                        cv2.putText(
-                            frame, label_txt,
-                            (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.8,
-                            (0, 255, 255),
-                            2
-                        )
 
-                    # Show frame (BGR is fine if you pass channels="BGR")
-                    frame_placeholder.image(frame, channels="BGR")
+                    out = engine.process(raw_frame)
+
+                    # store last stable emotion so UI can display even between inference frames
+                    if out.primary is not None:
+                        st.session_state.last_emotion = out.primary.emotion
+                        st.session_state.last_conf = out.primary.confidence
+
+                    # JPEG bytes only when a preview slot is due (display FPS is capped separately)
+                    if out.jpeg:
+                        frame_placeholder.image(out.jpeg, output_format="JPEG")
 
-                    # small sleep to avoid maxing CPU
-                    time.sleep(0.03)
+                    grabber.mark_processed()
+
+                    if engine.tracker.frames % 15 == 0:
+                        status_placeholder.info(
+                            "Camera running for 10 seconds... " + format_tracker_stats(engine.tracker.stats())
+                        )
 
-                cap.release()
+                engine.stop()
+                grabber.stop()
+                if debug_capture is not None:
+                    debug_capture.close()
+                st.session_state.suggested_mood = EMOTION_TO_MOOD.get(st.session_state.last_emotion)
                 st.session_state.camera_on = False
-                status_placeholder.success("Camera session complete (5 seconds).")
+                status_placeholder.success(
+                    "Camera session complete. " + format_capture_stats(grabber.stats())
+                    + " · " + format_engine_stats(engine.stats())
+                )
+
+    suggested = st.session_state.suggested_mood
+    if suggested and suggested != st.session_state.current_mood:
+        if st.button(f"Looks like you might be feeling {suggested} – use this mood?", key="use_camera_mood_btn"):
+            st.session_state.current_mood = suggested
+            st.session_state.suggested_mood = None
+            st.rerun()
+
+    with st.expander("🩺 Camera model diagnostics"):
+        diag_md = format_model_diagnostics(registry.diagnostics())
+        if diag_md:
+            st.markdown(diag_md)
+        else:
+            st.caption("Models load on first camera start and are then shared by all sessions.")
+
+        st.select_slider(
+            "Face detection width (px)",
+            options=[160, 240, 320, 400, 480, 640],
+            key="det_width",
+            help="Frames are downscaled to this width for YuNet; boxes are mapped back to full resolution. "
+                 "Use `python camera_pipeline.py sweep-scales <video>` to pick a value.",
+        )
+
+        st.slider("Preview JPEG quality", 40, 95, key="preview_quality")
+        st.slider(
+            "Preview max FPS",
+            2, 30,
+            key="preview_fps",
+            help="Caps how often frames are sent to the browser; detection and emotion run at their own rates.",
+        )
+
+        if st.button("Benchmark batched vs per-face emotion (1–8 faces)", key="bench_batching_btn"):
+            if registry.missing_files():
+                st.error("Emotion model file not found.")
+            else:
+                with st.spinner("Benchmarking FER+..."):
+                    rows = benchmark_batching(registry.emotion_net(), lock=registry.emotion_lock)
+                st.dataframe(rows, use_container_width=True)
+
+        if st.button("Measure FER+ preprocessing allocations", key="bench_prealloc_btn"):
+            st.json(measure_preprocess_allocations())
+
+        st.markdown("**Debug face capture**")
+        st.checkbox(
+            "Keep sampled FER+ inputs (max 1/s)",
+            key="debug_capture_on",
+            help="Off by default. Samples are kept in memory and optionally written by a background thread.",
+        )
+        st.text_input(
+            "Also save samples to folder (optional)",
+            key="debug_capture_dir",
+            placeholder="e.g. debug_faces",
+            disabled=not st.session_state.debug_capture_on,
+        )
+        debug_capture = st.session_state.debug_capture
+        if debug_capture is not None and debug_capture.snapshots():
+            samples = debug_capture.snapshots()
+            st.image(
+                [smp["input"] for smp in samples],
+                caption=[f"min/max {smp['min']}/{smp['max']}" for smp in samples],
+                width=64,
+            )
+            if debug_capture.directory:
+                st.caption(f"Written {debug_capture.written} samples to {debug_capture.directory}")
 
     st.markdown("---")
 
     # ================= CONVERSATION HISTORY =================
     st.subheader("💬 Conversation History")
-    if st.session_state.conversation_history:
-        for msg in st.session_state.conversation_history:
-            with st.chat_message(msg["role"]):
-                st.write(msg["text"])
-                if msg.get("used_pdf"):
+    history = st.session_state.conversation_history
+    if history:
+        shown = history.recent(st.session_state.history_visible)
+        hidden = history.available() - len(shown)
+        if hidden > 0:
+            if st.button(f"⬆️ Show older messages ({hidden} more)", key="history_older_btn"):
+                st.session_state.history_visible += HISTORY_PAGE
+                st.rerun()
+        for msg in shown:
+            with st.chat_message(msg.role):
+                st.write(msg.text)
+                if msg.used_pdf:
                     st.caption("📄 Used uploaded journal for context.")
+        if st.session_state.last_reply_audio:
+            # autoplay only on the first render after the reply, not on every later rerun
+            st.audio(
+                st.session_state.last_reply_audio,
+                format="audio/mp3",
+                autoplay=st.session_state.last_reply_autoplay,
+            )
+            st.session_state.last_reply_autoplay = False
     else:
         st.info("Start the conversation below.")
 
@@ -940,37 +1327,27 @@ with center_col:
 
         if st.button("Send Message", type="primary", use_container_width=True):
             if user_question.strip():
-                st.session_state.conversation_history.append(
-                    {
-                        "role": "user",
-                        "text": user_question,
-                        "timestamp": datetime.now().isoformat(),
-                    }
-                )
-
-                with st.spinner(
-                    f"EmoCare ({st.session_state.selected_avatar}) is thinking..."
-                ):
-                    response_text, _ = get_wellness_response(
-                        user_question,
-                        st.session_state.focus_area,
-                        st.session_state.current_mood,
-                        journal_text=st.session_state.uploaded_pdf_text,
+                with st.chat_message("user"):
+                    st.write(user_question)
+                with st.chat_message("assistant"):
+                    response_text = st.write_stream(
+                        stream_with_speech(
+                            stream_wellness_response(
+                                user_question,
+                                st.session_state.focus_area,
+                                st.session_state.current_mood,
+                                journal_text=st.session_state.uploaded_pdf_text,
+                                journal_index=st.session_state.journal_index,
+                                history=st.session_state.conversation_history,
+                            ),
+                        )
                     )
 
+                st.session_state.conversation_history.append("user", user_question)
                 st.session_state.conversation_history.append(
-                    {
-                        "role": "assistant",
-                        "text": response_text,
-                        "timestamp": datetime.now().isoformat(),
-                        "used_pdf": bool(st.session_state.uploaded_pdf_text),
-                    }
+                    "assistant", response_text, used_pdf=bool(st.session_state.uploaded_pdf_text)
                 )
-
-                if st.session_state.use_tts and elevenlabs_client:
-                    audio_bytes = elevenlabs_tts_bytes(response_text)
-                    if audio_bytes:
-                        st.audio(audio_bytes, format="audio/mp3")
+                compact_conversation()
 
                 st.rerun()
             else:
@@ -1056,37 +1433,26 @@ with center_col:
                     else:
                         st.success(f"Transcribed: {transcribed}")
 
-                        st.session_state.conversation_history.append(
-                            {
-                                "role": "user",
-                                "text": transcribed,
-                                "timestamp": datetime.now().isoformat(),
-                            }
-                        )
-
-                        with st.spinner(
-                            f"EmoCare ({st.session_state.selected_avatar}) is thinking..."
-                        ):
-                            response_text, _ = get_wellness_response(
-                                transcribed,
-                                st.session_state.focus_area,
-                                st.session_state.current_mood,
-                                journal_text=st.session_state.uploaded_pdf_text,
+                        with st.chat_message("assistant"):
+                            response_text = st.write_stream(
+                                stream_with_speech(
+                                    stream_wellness_response(
+                                        transcribed,
+                                        st.session_state.focus_area,
+                                        st.session_state.current_mood,
+                                        journal_text=st.session_state.uploaded_pdf_text,
+                                        journal_index=st.session_state.journal_index,
+                                        label="voice",
+                                        history=st.session_state.conversation_history,
+                                    ),
+                                )
                             )
 
+                        st.session_state.conversation_history.append("user", transcribed)
                         st.session_state.conversation_history.append(
-                            {
-                                "role": "assistant",
-                                "text": response_text,
-                                "timestamp": datetime.now().isoformat(),
-                                "used_pdf": bool(st.session_state.uploaded_pdf_text),
-                            }
+                            "assistant", response_text, used_pdf=bool(st.session_state.uploaded_pdf_text)
                         )
-
-                        if st.session_state.use_tts and elevenlabs_client:
-                            audio_bytes = elevenlabs_tts_bytes(response_text)
-                            if audio_bytes:
-                                st.audio(audio_bytes, format="audio/mp3")
+                        compact_conversation()
 
                     if os.path.exists(wav_path):
                         os.remove(wav_path)
@@ -1119,6 +1485,89 @@ with right_col:
     )
 
     st.caption("A calming voice assistant 🫂")
+
+    with st.expander("🗃️ TTS cache"):
+        cache_stats = tts_cache.snapshot()
+        hit_rate = cache_stats["hit_rate"]
+        st.caption(
+            f"Hit rate: {'–' if hit_rate is None else f'{hit_rate:.0%}'} · "
+            f"memory {cache_stats['memory_hits']} · disk {cache_stats['disk_hits']} · "
+            f"synthesized {cache_stats['misses']}"
+        )
+        st.caption(
+            f"Served {cache_stats['bytes_served'] / 1024:.0f} KB from cache · "
+            f"synthesized {cache_stats['bytes_synthesized'] / 1024:.0f} KB · "
+            f"{cache_stats['memory_entries']} clips in memory ({cache_stats['memory_mb']:.1f} MB) · "
+            + (f"{cache_stats['disk_mb']:.1f} MB on disk" if tts_cache.directory else "disk tier off")
+        )
+    st.markdown("---")
+
+    with st.expander("🧠 Response cache"):
+        st.checkbox(
+            "Reuse replies for near-identical messages",
+            key="llm_cache_near_dup",
+            help=(
+                "Exact repeats are always reused. This also matches close rewordings (TF-IDF similarity) "
+                "with the same mood and focus, even if the earlier reply came at another point in the chat."
+            ),
+        )
+        st.session_state.llm_cache.near_duplicate = st.session_state.llm_cache_near_dup
+        st.slider(
+            "Joke variety pool",
+            0, 8,
+            key="joke_variety",
+            help="0 = always fetch a fresh joke. N = keep N jokes per mood/companion and rotate through them.",
+        )
+        st.slider(
+            "Jokes prepared in advance",
+            0, 3,
+            key="joke_prefetch",
+            help="Generate the next joke(s) in the background so the button answers instantly. 0 = off.",
+        )
+        prefetch_stats = st.session_state.joke_prefetcher.snapshot()
+        st.caption(
+            f"Prefetched jokes: {prefetch_stats['ready']} ready · {prefetch_stats['pending']} in progress · "
+            f"served {prefetch_stats['hits']} · missed {prefetch_stats['misses']} · "
+            f"discarded {prefetch_stats['discarded']}"
+        )
+        cache_stats = st.session_state.llm_cache.snapshot()
+        hit_rate = cache_stats["hit_rate"]
+        st.caption(
+            f"Hit rate: {'–' if hit_rate is None else f'{hit_rate:.0%}'} · "
+            f"exact {cache_stats['hits']} · near {cache_stats['near_hits']} · "
+            f"misses {cache_stats['misses']} · bypassed {cache_stats['bypassed']} · "
+            f"{cache_stats['entries']} entries"
+        )
+        if st.button("Clear response cache", key="clear_llm_cache"):
+            st.session_state.llm_cache.clear()
+
+    with st.expander("🧵 Conversation memory"):
+        st.slider(
+            "Prompt budget (tokens)", 500, 4000, step=250, key="context_budget",
+            help="System prompt, summary, recent turns and your message all fit in this budget.",
+        )
+        st.slider("Recent turns kept word-for-word", 1, 8, key="context_keep_turns")
+        window = st.session_state.context_window
+        if window.last_stats:
+            stats = window.last_stats
+            st.caption(
+                f"Last prompt ≈ {stats['prompt_tokens']} tokens · {stats['verbatim_messages']} recent messages · "
+                f"{stats['summarized_messages']} summarized"
+            )
+        if window.summary:
+            st.markdown("**Summary of earlier conversation**")
+            st.write(window.summary)
+        else:
+            st.caption("Older turns are summarized here once the conversation gets longer.")
+
+    with st.expander("⏱️ Response timing"):
+        st.caption(f"LLM: {llm_config.describe()}")
+        if llm_gateway:
+            st.caption(format_gateway_stats(llm_gateway.snapshot()))
+        if st.session_state.llm_timings:
+            st.dataframe(list(reversed(st.session_state.llm_timings)), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Time-to-first-token and total time show up here after a reply.")
     st.markdown("---")
 
     st.markdown("#### 🎛️ Mic & Speaker Selection")